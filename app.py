@@ -1,16 +1,115 @@
 from flask import Flask, jsonify
-import subprocess
+import contextlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 app = Flask(__name__)
 
+TREE_POSE_SCRIPT = os.path.abspath('yoga_poses/Tree_pose.py')
+
+# Functions the script may expose to run one session; the first one defined is used
+TREE_POSE_ENTRY_POINTS = ('main', 'count_tree_pose')
+
+# One long-lived worker runs the pose script, so it is imported and its models built once
+_pool = None
+_pool_lock = threading.Lock()
+
+# Set in the worker process
+_tree_pose = None
+
+def _load_tree_pose():
+    """Import the script as a module in the worker, without running its __main__ block"""
+    global _tree_pose
+    if _tree_pose is None:
+        spec = importlib.util.spec_from_file_location('tree_pose_script', TREE_POSE_SCRIPT)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _tree_pose = module
+    return _tree_pose
+
+def _init_worker():
+    try:
+        _load_tree_pose()
+    except Exception:
+        # A failed initializer would break the pool; the next request retries and reports it
+        traceback.print_exc()
+
+def _ping():
+    return os.getpid()
+
+def _run_tree_pose():
+    """Run one session of the script in the worker and return (returncode, stdout, stderr)"""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            module = _load_tree_pose()
+            entry = next((getattr(module, name) for name in TREE_POSE_ENTRY_POINTS
+                          if callable(getattr(module, name, None))), None)
+            if entry is None:
+                raise AttributeError(f"{TREE_POSE_SCRIPT} defines none of {', '.join(TREE_POSE_ENTRY_POINTS)}")
+            result = entry()
+            if result is not None:
+                print(result)
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+    return returncode, stdout.getvalue(), stderr.getvalue()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+        return _pool
+
+def _discard_pool(pool):
+    # The worker died (e.g. a native crash or OOM), which breaks the pool for good
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_in_worker(fn):
+    """Run fn in the worker and wait for it, replacing the pool if it broke"""
+    pool = get_pool()
+    try:
+        future = pool.submit(fn)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        pool = get_pool()
+        future = pool.submit(fn)
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
 @app.route('/run_tree_pose', methods=['GET'])
 def run_tree_pose():
     try:
         # Run your Python script
-        result = subprocess.run(['python', 'yoga_poses/Tree_pose.py'], capture_output=True, text=True)
-        return jsonify({'stdout': result.stdout, 'stderr': result.stderr}), result.returncode
+        returncode, stdout, stderr = run_in_worker(_run_tree_pose)
+        return jsonify({'stdout': stdout, 'stderr': stderr}), 200 if returncode == 0 else 500
+    except BrokenProcessPool as e:
+        return jsonify({'error': f"Pose worker crashed: {e}"}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Boot the worker before the first request; the reloader would start a second one
+    get_pool().submit(_ping)
+    app.run(debug=True, use_reloader=False)
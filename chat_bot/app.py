@@ -1,11 +1,13 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import tensorflow as tf
-import pickle
+import hmac
 import numpy as np
-from keras.preprocessing.sequence import pad_sequences
 import os
+import time
 from dotenv import load_dotenv
+from cache import LRUCache
+from serving import ModelManager
+from tokenization import MAX_SEQUENCE_LENGTH
 
 # Load environment variables
 load_dotenv()
@@ -41,15 +43,58 @@ CORS(app, resources={r"/*": {
     "allow_headers": ["Content-Type"]
 }})
 
+# Micro-batching: concurrent requests arriving within the wait window share one model call
+BATCH_SIZE = int(os.getenv('CHAT_BATCH_SIZE', 64))
+BATCH_WAIT_MS = float(os.getenv('CHAT_BATCH_WAIT_MS', 5))
+PREDICT_TIMEOUT = float(os.getenv('CHAT_PREDICT_TIMEOUT', 10))
+
+# Largest number of messages accepted by /chat/batch
+MAX_BATCH_ITEMS = int(os.getenv('CHAT_MAX_BATCH_ITEMS', 1000))
+
+# Predicted goals keyed on the message's token sequence, so repeated intents skip the model
+goal_cache = LRUCache(
+    maxsize=int(os.getenv('CHAT_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('CHAT_CACHE_TTL', 3600))
+)
+
+# Plans only depend on the BMI category and goal
+plan_cache = LRUCache(maxsize=64)
+
+# Inference backend: 'keras' loads the .h5 model with TensorFlow, 'numpy' runs the
+# weights exported by train_model.py without importing TensorFlow at all
+MODEL_BACKEND = os.getenv('CHAT_MODEL_BACKEND', 'keras')
+MODEL_PATH = os.getenv('CHAT_MODEL_PATH', 'fitness_classifier.h5')
+NUMPY_WEIGHTS_PATH = os.getenv('CHAT_NUMPY_WEIGHTS_PATH', 'fitness_classifier.npz')
+
+# Flat vocabulary exported from tokenizer.pkl by train_model.py
+VOCABULARY_PATH = os.getenv('CHAT_VOCABULARY_PATH', 'vocabulary.json')
+
+# Hot reload: set CHAT_MODEL_WATCH_INTERVAL to poll the model files for changes,
+# and/or CHAT_ADMIN_TOKEN to enable POST /admin/reload. A reload only swaps the model in
+# the worker process that handles the request; with several workers, use the file watcher
+MODEL_WATCH_INTERVAL = float(os.getenv('CHAT_MODEL_WATCH_INTERVAL', 0))
+ADMIN_TOKEN = os.getenv('CHAT_ADMIN_TOKEN')
+
+# Set CHAT_SERVER_TIMING=1 to report where each request spent its time in a
+# Server-Timing header (parse, tokenize, predict, plan)
+SERVER_TIMING = os.getenv('CHAT_SERVER_TIMING') == '1'
+
 # Load the trained model and tokenizer
+model_manager = ModelManager(
+    MODEL_BACKEND,
+    MODEL_PATH,
+    NUMPY_WEIGHTS_PATH,
+    VOCABULARY_PATH,
+    batch_size=BATCH_SIZE,
+    batch_wait=BATCH_WAIT_MS / 1000,
+    drain_timeout=PREDICT_TIMEOUT
+)
 try:
-    model = tf.keras.models.load_model('fitness_classifier.h5')
-    with open('tokenizer.pkl', 'rb') as f:
-        tokenizer = pickle.load(f)
+    model_manager.load()
 except Exception as e:
     print(f"Error loading model or tokenizer: {e}")
-    model = None
-    tokenizer = None
+if MODEL_WATCH_INTERVAL > 0:
+    model_manager.watch(MODEL_WATCH_INTERVAL)
 
 goal_labels = {
     0: 'weight_loss',
@@ -82,6 +127,16 @@ def _calculate_pushups(bmi):
     else:  # Obese
         return "2 sets of 4-8 reps"
 
+def bmi_bucket(bmi):
+    """BMI category used by the plan rules: 0 underweight to 3 obese"""
+    if bmi < 18.5:
+        return 0
+    elif bmi < 25:
+        return 1
+    elif bmi < 30:
+        return 2
+    return 3
+
 def generate_plan(height, weight, goal):
     """Generate exercise plan with input validation"""
     # Validate height (40cm to 250cm)
@@ -97,7 +152,15 @@ def generate_plan(height, weight, goal):
     # Calculate BMI
     bmi = weight / ((height / 100) ** 2)
     
-    # Generate safe exercise plan based on BMI and goal
+    # Every BMI in the same category gets the same plan
+    plan = plan_cache.get_or_compute(
+        (bmi_bucket(bmi), goal),
+        lambda: _build_plan(bmi, goal)
+    )
+    return dict(plan)
+
+def _build_plan(bmi, goal):
+    """Generate safe exercise plan based on BMI and goal"""
     plans = {
         'weight_loss': {
             'exercise': 'Cardio, Push-ups',
@@ -128,66 +191,88 @@ def generate_plan(height, weight, goal):
     
     return plans[goal]
 
+def sequence_key(model, row, length):
+    """Cache key for an encoded message: the model version and the tokens it sees"""
+    return (model.version, row[:length].tobytes())
+
+def predict_goal(model, row, length):
+    """Predict the goal for one encoded message, using the cache when possible"""
+    key = sequence_key(model, row, length)
+    goal = goal_cache.get(key)
+    if goal is None:
+        # Batched with any concurrent requests
+        prediction = model.batcher.predict(row, timeout=PREDICT_TIMEOUT)
+        goal = goal_labels[int(np.argmax(prediction))]
+        goal_cache.put(key, goal)
+    return goal
+
+def server_timing(stages):
+    """Server-Timing header value for a list of (stage, seconds) pairs"""
+    return ', '.join(f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in stages)
+
+def parse_chat_item(data):
+    """Validate one chat request body and return (message, height, weight)"""
+    if not data or not isinstance(data, dict):
+        raise ValueError('Invalid request format')
+        
+    # Validate required fields
+    required_fields = ['message', 'height', 'weight']
+    for field in required_fields:
+        if field not in data:
+            raise ValueError(f'Missing required field: {field}')
+    
+    message = str(data['message']).strip()
+    if not message:
+        raise ValueError('Empty message')
+        
+    height = validate_numeric_input(data['height'], 40, 250, "height")
+    weight = validate_numeric_input(data['weight'], 20, 300, "weight")
+    return message, height, weight
+
 @app.route('/chat', methods=['POST'])
 def chat():
-    if not model or not tokenizer:
+    # Use one model version for the whole request, even if a reload swaps it meanwhile
+    model = model_manager.current
+    if not model:
         return jsonify({
             'error': 'Model not initialized'
         }), 500
         
     try:
+        started = time.perf_counter()
         data = request.get_json()
         
-        if not data or not isinstance(data, dict):
-            return jsonify({
-                'error': 'Invalid request format'
-            }), 400
-            
-        # Validate required fields
-        required_fields = ['message', 'height', 'weight']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'error': f'Missing required field: {field}'
-                }), 400
-        
-        # Process message
-        message = str(data['message']).strip()
-        if not message:
-            return jsonify({
-                'error': 'Empty message'
-            }), 400
-            
-        # Validate and process height and weight
+        # Validate message, height and weight
         try:
-            height = validate_numeric_input(
-                data['height'], 40, 250, "height"
-            )
-            weight = validate_numeric_input(
-                data['weight'], 20, 300, "weight"
-            )
+            message, height, weight = parse_chat_item(data)
         except ValueError as e:
             return jsonify({'error': str(e)}), 400
+        parsed = time.perf_counter()
         
-        # Tokenize and pad the message
-        sequence = tokenizer.texts_to_sequences([message])
-        padded_sequence = pad_sequences(
-            sequence,
-            maxlen=100,
-            padding='post'
-        )
+        # Tokenize the message straight into a padded row
+        row = np.zeros(MAX_SEQUENCE_LENGTH, dtype=np.int32)
+        length = model.tokenizer.encode_into(message, row)
+        tokenized = time.perf_counter()
         
         # Get model prediction
-        prediction = model.predict(padded_sequence)
-        predicted_goal = goal_labels[np.argmax(prediction[0])]
+        predicted_goal = predict_goal(model, row, length)
+        predicted = time.perf_counter()
         
         # Generate exercise plan
         try:
             plan = generate_plan(height, weight, predicted_goal)
-            return jsonify({
+            response = jsonify({
                 'goal': predicted_goal,
                 'plan': plan
             })
+            if SERVER_TIMING:
+                response.headers['Server-Timing'] = server_timing([
+                    ('parse', parsed - started),
+                    ('tokenize', tokenized - parsed),
+                    ('predict', predicted - tokenized),
+                    ('plan', time.perf_counter() - predicted)
+                ])
+            return response
         except ValueError as e:
             return jsonify({'error': str(e)}), 400
             
@@ -196,6 +281,122 @@ def chat():
             'error': f'Internal server error: {str(e)}'
         }), 500
 
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Classify many messages with one tokenizer call and one model call"""
+    model = model_manager.current
+    if not model:
+        return jsonify({
+            'error': 'Model not initialized'
+        }), 500
+        
+    try:
+        started = time.perf_counter()
+        data = request.get_json()
+        
+        # Accept a bare array or {"items": [...]}
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({
+                'error': 'Invalid request format'
+            }), 400
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({
+                'error': f'Too many items (max {MAX_BATCH_ITEMS})'
+            }), 400
+        
+        # Validate every item; invalid ones are reported inline
+        results = [None] * len(items)
+        valid = []
+        for i, item in enumerate(items):
+            try:
+                valid.append((i,) + parse_chat_item(item))
+            except ValueError as e:
+                results[i] = {'error': str(e)}
+        parsed = tokenized = predicted = time.perf_counter()
+        
+        if valid:
+            # Encode all valid messages into one padded matrix and check the cache
+            padded, lengths = model.tokenizer.encode_batch(
+                [message for _, message, _, _ in valid],
+                MAX_SEQUENCE_LENGTH
+            )
+            tokenized = time.perf_counter()
+            keys = [sequence_key(model, row, length) for row, length in zip(padded, lengths)]
+            goals = [goal_cache.get(key) for key in keys]
+            
+            # One model call for every message that was not cached
+            uncached = [j for j, goal in enumerate(goals) if goal is None]
+            if uncached:
+                predictions = model.predict_batch(padded[uncached])
+                for j, prediction in zip(uncached, predictions):
+                    goals[j] = goal_labels[int(np.argmax(prediction))]
+                    goal_cache.put(keys[j], goals[j])
+            predicted = time.perf_counter()
+            
+            for (i, _, height, weight), predicted_goal in zip(valid, goals):
+                try:
+                    results[i] = {
+                        'goal': predicted_goal,
+                        'plan': generate_plan(height, weight, predicted_goal)
+                    }
+                except ValueError as e:
+                    results[i] = {'error': str(e)}
+        
+        response = jsonify({
+            'results': results,
+            'count': len(results),
+            'errors': sum(1 for result in results if 'error' in result)
+        })
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = server_timing([
+                ('parse', parsed - started),
+                ('tokenize', tokenized - parsed),
+                ('predict', predicted - tokenized),
+                ('plan', time.perf_counter() - predicted)
+            ])
+        return response
+            
+    except Exception as e:
+        return jsonify({
+            'error': f'Internal server error: {str(e)}'
+        }), 500
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Cache hit rates and batching statistics"""
+    model = model_manager.current
+    return jsonify({
+        'goal_cache': goal_cache.stats(),
+        'plan_cache': plan_cache.stats(),
+        'batcher': model.batcher.stats() if model else None,
+        'model': model_manager.status()
+    })
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 only once a warmed-up model is serving"""
+    status = model_manager.status()
+    return jsonify(status), 200 if model_manager.ready else 503
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """Load the model files again in the background and swap them in when warm
+
+    Only the worker that receives this request reloads; other workers keep their version
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    # Compare bytes: compare_digest rejects str with non-ASCII characters
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({
+            'error': 'Forbidden'
+        }), 403
+    
+    started = model_manager.reload_async()
+    status = model_manager.status()
+    status['started'] = started
+    return jsonify(status), 202
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug_mode = os.getenv('FLASK_ENV') == 'development'
@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects concurrent predictions for a few milliseconds and runs them as one batch.
+
+    Callers submit a padded int32 row and block on the returned Future. A single
+    worker thread stacks everything that arrived within the wait window into one
+    matrix, calls predict_fn once and hands each caller its own result.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait=0.005):
+        self.predict_fn = predict_fn  # predict_fn(int32 matrix) -> (batch, classes) array
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chat-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Queue one padded row; the Future resolves to its class probabilities."""
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def predict(self, row, timeout=None):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(row).result(timeout=timeout)
+
+    def stop(self):
+        self._stop_event.set()
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the window closes."""
+        item = self._queue.get()
+        if item is None:
+            return []
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            futures = [future for _, future in batch]
+            try:
+                padded = np.stack([row for row, _ in batch])
+                predictions = self.predict_fn(padded)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            for future, prediction in zip(futures, predictions):
+                future.set_result(prediction)
+
+        # Fail anything still waiting so callers do not hang on shutdown
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Batcher stopped"))
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'avg_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+            'queue_depth': self._queue.qsize()
+        }
@@ -0,0 +1,298 @@
+"""Load test for the /chat endpoint.
+
+    python load_test.py                          # in-process, Flask test client
+    python load_test.py --serve --concurrency 1 8 32
+    python load_test.py --url http://localhost:5000 --corpus messages.jsonl
+
+By default the app is imported in this process with CHAT_SERVER_TIMING=1 and
+runs offline against the bundled model files. Each concurrency level reports
+requests/sec, latency percentiles and the server's own split of every request
+into parse, tokenize, predict and plan time.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Used when no --corpus is given; covers every goal and some messages the model has not seen
+DEFAULT_CORPUS = [
+    "I want to lose weight",
+    "How can I burn fat quickly?",
+    "Help me lose some belly fat",
+    "How do I gain muscle?",
+    "I want to build strength and get bigger",
+    "Best way to bulk up",
+    "Help me with endurance",
+    "I want to run a marathon",
+    "How do I improve my stamina?",
+    "I need better flexibility",
+    "How can I become more flexible?",
+    "Stretching routine for tight hamstrings",
+    "Just want to maintain fitness",
+    "Keep me in shape",
+    "I want to stay healthy and active",
+    "What should I do at the gym today?"
+]
+
+STAGES = ['parse', 'tokenize', 'predict', 'plan']
+
+
+def load_corpus(path):
+    """Messages from a text file (one per line) or JSON lines with a "message" field"""
+    messages = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                messages.append(json.loads(line)['message'])
+            else:
+                messages.append(line)
+    return messages
+
+
+def make_requests(messages, count, seed=0):
+    """Request bodies cycling through the corpus with heights and weights across BMI categories"""
+    rng = random.Random(seed)
+    return [
+        {
+            'message': message,
+            'height': rng.randint(150, 200),
+            'weight': rng.randint(45, 130)
+        }
+        for message in itertools.islice(itertools.cycle(messages), count)
+    ]
+
+
+def parse_server_timing(header):
+    """{stage: milliseconds} from a Server-Timing header"""
+    timings = {}
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur' and name:
+                timings[name] = float(value)
+    return timings
+
+
+class TestClientTarget:
+    """Sends requests through the Flask test client of an app imported in this process"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, path, body):
+        # One client per thread; the test client is not meant to be shared
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post(path, json=body)
+        return response.status_code, response.headers.get('Server-Timing')
+
+    def get_json(self, path):
+        return self.app.test_client().get(path).get_json()
+
+
+class HttpTarget:
+    """Sends requests to a running server"""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def post(self, path, body):
+        request = urllib.request.Request(
+            self.url + path,
+            data=json.dumps(body).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Server-Timing')
+
+    def get_json(self, path):
+        try:
+            with urllib.request.urlopen(self.url + path, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except (urllib.error.URLError, ValueError):
+            return None
+
+
+def import_app(backend, cache_size):
+    """Import app.py offline with Server-Timing on and model paths pointing at the bundled files"""
+    os.environ['CHAT_SERVER_TIMING'] = '1'
+    os.environ['CHAT_MODEL_BACKEND'] = backend
+    os.environ.setdefault('CHAT_MODEL_PATH', os.path.join(BASE_DIR, 'fitness_classifier.h5'))
+    os.environ.setdefault('CHAT_NUMPY_WEIGHTS_PATH', os.path.join(BASE_DIR, 'fitness_classifier.npz'))
+    os.environ.setdefault('CHAT_VOCABULARY_PATH', os.path.join(BASE_DIR, 'vocabulary.json'))
+    if cache_size is not None:
+        os.environ['CHAT_CACHE_SIZE'] = str(cache_size)
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+
+    import app as chat_app
+    if not chat_app.model_manager.ready:
+        raise SystemExit(f"Model failed to load: {chat_app.model_manager.last_error}")
+    return chat_app
+
+
+def start_local_server(app):
+    """Serve app on a free localhost port from a background thread and return its URL"""
+    import logging
+    from werkzeug.serving import make_server
+
+    # One access log line per request would swamp the report
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="load-test-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def summarize(values):
+    """Percentiles of a list of milliseconds"""
+    if not values:
+        return None
+    values = np.asarray(values)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'mean': round(float(values.mean()), 3),
+        'max': round(float(values.max()), 3)
+    }
+
+
+def run_level(target, bodies, concurrency, path='/chat'):
+    """Send every body with the given number of concurrent workers and measure them"""
+    latencies = []
+    stages = {stage: [] for stage in STAGES}
+    statuses = {}
+    lock = threading.Lock()
+    pending = iter(bodies)
+
+    def worker():
+        while True:
+            with lock:
+                body = next(pending, None)
+            if body is None:
+                return
+            started = time.perf_counter()
+            status, timing = target.post(path, body)
+            elapsed = (time.perf_counter() - started) * 1000
+            timings = parse_server_timing(timing)
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                for stage, value in timings.items():
+                    stages.setdefault(stage, []).append(value)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    seconds = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': sum(count for status, count in statuses.items() if status != 200),
+        'status_codes': {str(status): count for status, count in sorted(statuses.items())},
+        'seconds': round(seconds, 3),
+        'requests_per_second': round(len(latencies) / seconds, 1) if seconds else 0.0,
+        'latency_ms': summarize(latencies),
+        'server_timing_ms': {stage: summarize(values) for stage, values in stages.items() if values}
+    }
+
+
+def print_level(result):
+    latency = result['latency_ms'] or {}
+    print(f"\nconcurrency {result['concurrency']}: {result['requests']} requests in {result['seconds']}s, "
+          f"{result['requests_per_second']} req/s, {result['errors']} errors")
+    print(f"  latency ms   p50 {latency.get('p50')}  p95 {latency.get('p95')}  "
+          f"p99 {latency.get('p99')}  max {latency.get('max')}")
+    for stage, summary in result['server_timing_ms'].items():
+        print(f"  {stage:<12} p50 {summary['p50']}  p95 {summary['p95']}  mean {summary['mean']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat endpoint.")
+    parser.add_argument('--url', help="Test a running server instead of importing the app")
+    parser.add_argument('--serve', action='store_true',
+                        help="Import the app and serve it over HTTP on localhost for the test")
+    parser.add_argument('--backend', choices=['keras', 'numpy'], default=os.getenv('CHAT_MODEL_BACKEND', 'keras'))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=1000, help="Requests per concurrency level")
+    parser.add_argument('--warmup', type=int, default=50, help="Untimed requests sent before each level")
+    parser.add_argument('--corpus', help="Text file of messages, or JSON lines with a message field")
+    parser.add_argument('--cache-size', type=int,
+                        help="Goal cache size for the imported app; 0 sends every request to the model")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Also write the results as JSON here")
+    args = parser.parse_args()
+
+    messages = load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS
+    if not messages:
+        raise SystemExit("Corpus is empty")
+
+    server = None
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        chat_app = import_app(args.backend, args.cache_size)
+        if args.serve:
+            url, server = start_local_server(chat_app.app)
+            target = HttpTarget(url)
+        else:
+            target = TestClientTarget(chat_app.app)
+
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            run_level(target, make_requests(messages, args.warmup, args.seed), concurrency)
+            result = run_level(target, make_requests(messages, args.requests, args.seed), concurrency)
+            results.append(result)
+            print_level(result)
+
+        # Cache and batching behaviour over the whole run
+        stats = target.get_json('/stats')
+    finally:
+        if server:
+            server.shutdown()
+
+    if stats:
+        batcher = stats.get('batcher') or {}
+        print(f"\ngoal cache hit rate {stats['goal_cache']['hit_rate']}, "
+              f"average model batch {batcher.get('avg_batch_size')}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'target': args.url or ('local server' if args.serve else 'test client'),
+                'backend': None if args.url else args.backend,
+                'corpus_size': len(messages),
+                'levels': results,
+                'stats': stats
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
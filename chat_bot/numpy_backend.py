@@ -0,0 +1,85 @@
+import numpy as np
+
+# Arrays written by train_model.py --export-npz
+WEIGHT_NAMES = (
+    'embedding',       # (vocab, embed_dim)
+    'lstm_kernel',     # (embed_dim, 4 * units), gates in Keras order i, f, c, o
+    'lstm_recurrent',  # (units, 4 * units)
+    'lstm_bias',       # (4 * units,)
+    'dense_kernel',    # (units, classes)
+    'dense_bias'       # (classes,)
+)
+
+# Optional flags; files exported before masking was supported lack them
+DEFAULT_FLAGS = {'mask_zero': False}
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyLSTMClassifier:
+    """Embedding -> LSTM -> softmax Dense forward pass in plain NumPy.
+
+    Reproduces the Keras model in fitness_classifier.h5 (tanh activation,
+    sigmoid recurrent activation, optional zero masking) without importing
+    TensorFlow.
+    """
+
+    def __init__(self, weights, mask_zero=False):
+        self.mask_zero = mask_zero
+        embedding = weights['embedding'].astype(np.float32)
+        kernel = weights['lstm_kernel'].astype(np.float32)
+        self.units = weights['lstm_recurrent'].shape[0]
+        self.recurrent = weights['lstm_recurrent'].astype(np.float32)
+        self.dense_kernel = weights['dense_kernel'].astype(np.float32)
+        self.dense_bias = weights['dense_bias'].astype(np.float32)
+        # Each token's input projection is fixed, so fold the embedding,
+        # input kernel and bias into one lookup table
+        self.input_table = embedding @ kernel + weights['lstm_bias'].astype(np.float32)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            missing = [name for name in WEIGHT_NAMES if name not in data]
+            if missing:
+                raise ValueError(f"Missing weights in {path}: {', '.join(missing)}")
+            flags = {name: bool(data[name]) if name in data else default
+                     for name, default in DEFAULT_FLAGS.items()}
+            return cls({name: data[name] for name in WEIGHT_NAMES}, **flags)
+
+    def __call__(self, padded):
+        """Class probabilities for a padded (batch, steps) int matrix."""
+        units = self.units
+        padded = np.asarray(padded)
+        mask = None
+        if self.mask_zero:
+            # Masked steps carry the state through unchanged, so trailing
+            # padding after the longest message in the batch can be skipped
+            mask = padded != 0
+            used = np.flatnonzero(mask.any(axis=0))
+            padded = padded[:, :used[-1] + 1 if len(used) else 0]
+            mask = mask[:, :padded.shape[1], None]
+
+        inputs = self.input_table[padded]  # (batch, steps, 4 * units)
+        h = np.zeros((inputs.shape[0], units), dtype=np.float32)
+        c = np.zeros_like(h)
+
+        for step in range(inputs.shape[1]):
+            z = inputs[:, step] + h @ self.recurrent
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c_next = f * c + i * g
+            h_next = o * np.tanh(c_next)
+            if mask is None:
+                c, h = c_next, h_next
+            else:
+                c = np.where(mask[:, step], c_next, c)
+                h = np.where(mask[:, step], h_next, h)
+
+        logits = h @ self.dense_kernel + self.dense_bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from batching import MicroBatcher
+from tokenization import VocabularyTokenizer, MAX_SEQUENCE_LENGTH
+
+# Representative messages run through the tokenizer and model before a version serves traffic
+WARMUP_MESSAGES = [
+    "I want to lose weight",
+    "How do I gain muscle?",
+    "Help me with endurance",
+    "I need better flexibility",
+    "Just want to maintain fitness"
+]
+
+
+def load_keras_classifier(path):
+    """Load the Keras model and return a function classifying a padded int32 batch"""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(path)
+
+    # Traced once for any batch size, skipping the per-call setup of model.predict
+    @tf.function(input_signature=[tf.TensorSpec([None, MAX_SEQUENCE_LENGTH], tf.int32)])
+    def serve(x):
+        return model(x, training=False)
+
+    def predict(padded):
+        return serve(tf.convert_to_tensor(padded, dtype=tf.int32)).numpy()
+    return predict
+
+
+def load_classifier(backend, model_path, weights_path):
+    """Load the classifier for a backend: 'keras' (.h5 via TensorFlow) or 'numpy' (.npz)"""
+    if backend == 'numpy':
+        from numpy_backend import NumpyLSTMClassifier
+        return NumpyLSTMClassifier.load(weights_path)
+    if backend != 'keras':
+        raise ValueError(f"Unknown CHAT_MODEL_BACKEND: {backend}")
+    return load_keras_classifier(model_path)
+
+
+class ModelVersion:
+    """A classifier, the tokenizer it was trained with and its batcher, served as one unit.
+
+    Requests take a reference to one version and use it throughout, so a swap
+    never pairs a tokenizer with the wrong model.
+    """
+
+    def __init__(self, version, predict_batch, tokenizer, batcher, fingerprint, warmup=None):
+        self.version = version
+        self.predict_batch = predict_batch
+        self.tokenizer = tokenizer
+        self.batcher = batcher
+        self.fingerprint = fingerprint
+        self.warmup = warmup or {}  # Load and warm-up timings
+        self.loaded_at = time.time()
+
+
+class ModelManager:
+    """Loads model versions in the background and swaps them in atomically."""
+
+    def __init__(self, backend, model_path, weights_path, vocabulary_path,
+                 batch_size=64, batch_wait=0.005, drain_timeout=10):
+        self.backend = backend
+        self.model_path = model_path
+        self.weights_path = weights_path
+        self.vocabulary_path = vocabulary_path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.drain_timeout = drain_timeout  # How long a replaced version keeps serving in-flight requests
+        self.current = None
+        self.reloading = False
+        self.last_error = None
+        self._version = 0
+        self._reload_lock = threading.Lock()
+
+    def model_files(self):
+        weights = self.weights_path if self.backend == 'numpy' else self.model_path
+        return [weights, self.vocabulary_path]
+
+    def fingerprint(self):
+        """Modification time and size of every file a version is loaded from."""
+        return tuple(
+            (path, stat.st_mtime_ns, stat.st_size)
+            for path, stat in ((path, os.stat(path)) for path in self.model_files())
+        )
+
+    def warm_up(self, predict_batch, tokenizer):
+        """Run representative batches so the first real request does not pay for tracing.
+
+        Returns the latency of the very first (cold) call and of each batch size once warm.
+        """
+        messages = (WARMUP_MESSAGES * self.batch_size)[:self.batch_size]
+        padded, _ = tokenizer.encode_batch(messages, MAX_SEQUENCE_LENGTH)
+
+        started = time.perf_counter()
+        predict_batch(padded[:1])
+        first_inference = time.perf_counter() - started
+
+        latency = {}
+        for size in sorted({1, min(8, self.batch_size), self.batch_size}):
+            predict_batch(padded[:size])  # First call at a new size may still allocate
+            started = time.perf_counter()
+            predict_batch(padded[:size])
+            latency[size] = round((time.perf_counter() - started) * 1000, 3)
+
+        return {
+            'first_inference_ms': round(first_inference * 1000, 3),
+            'latency_ms': latency
+        }
+
+    def load(self):
+        """Load, warm up and swap in a new version; blocks until it is serving."""
+        self._reload_lock.acquire()
+        return self._load_locked()
+
+    def _load_locked(self):
+        """Body of load(); the caller holds _reload_lock and this releases it"""
+        self.reloading = True
+        batcher = None
+        try:
+            started = time.perf_counter()
+            fingerprint = self.fingerprint()
+            predict_batch = load_classifier(self.backend, self.model_path, self.weights_path)
+            tokenizer = VocabularyTokenizer.load(self.vocabulary_path)
+            loaded_in = time.perf_counter() - started
+
+            warmup = self.warm_up(predict_batch, tokenizer)
+            batcher = MicroBatcher(
+                predict_batch,
+                max_batch_size=self.batch_size,
+                max_wait=self.batch_wait
+            )
+            # Also start the batcher's thread path before real requests arrive
+            batcher.predict(tokenizer.encode_batch(WARMUP_MESSAGES[:1], MAX_SEQUENCE_LENGTH)[0][0])
+            warmup['load_seconds'] = round(loaded_in, 3)
+            warmup['warmup_seconds'] = round(time.perf_counter() - started - loaded_in, 3)
+
+            self._version += 1
+            loaded = ModelVersion(self._version, predict_batch, tokenizer, batcher, fingerprint, warmup)
+            previous, self.current = self.current, loaded
+            self.last_error = None
+        except Exception as e:
+            if batcher:
+                batcher.stop()
+            self.last_error = str(e)
+            raise
+        finally:
+            self.reloading = False
+            self._reload_lock.release()
+
+        if previous:
+            # Let requests that already hold the old version finish before stopping it
+            timer = threading.Timer(self.drain_timeout, previous.batcher.stop)
+            timer.daemon = True
+            timer.start()
+        print(f"Serving model version {loaded.version} "
+              f"(loaded in {loaded.warmup['load_seconds']}s, warmed up in {loaded.warmup['warmup_seconds']}s)")
+        return loaded
+
+    def _load_quietly(self, locked=False):
+        try:
+            if locked:
+                self._load_locked()
+            else:
+                self.load()
+        except Exception as e:
+            print(f"Error reloading model: {e}")
+
+    def reload_async(self):
+        """Start loading a new version in the background; False if one is already loading.
+
+        Only affects this process: with several workers, each one reloads on its own.
+        """
+        # Take the lock here so two concurrent calls cannot both start a reload
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self.reloading = True
+        try:
+            threading.Thread(target=self._load_quietly, args=(True,), name="model-reload", daemon=True).start()
+        except Exception:
+            self.reloading = False
+            self._reload_lock.release()
+            raise
+        return True
+
+    def watch(self, interval):
+        """Reload whenever the model files change and stay unchanged for one poll."""
+        def run():
+            pending = None
+            while True:
+                time.sleep(interval)
+                try:
+                    fingerprint = self.fingerprint()
+                except OSError:
+                    continue  # Files are being replaced
+                current = self.current
+                if current and fingerprint == current.fingerprint:
+                    pending = None
+                elif fingerprint == pending:
+                    self._load_quietly()
+                    pending = None
+                else:
+                    pending = fingerprint
+
+        threading.Thread(target=run, name="model-watcher", daemon=True).start()
+
+    @property
+    def ready(self):
+        """True once a warmed-up version is serving."""
+        return self.current is not None
+
+    def status(self):
+        current = self.current
+        return {
+            'ready': current is not None,
+            'backend': self.backend,
+            'version': current.version if current else None,
+            'loaded_at': current.loaded_at if current else None,
+            'warmup': current.warmup if current else None,
+            'reloading': self.reloading,
+            'last_error': self.last_error
+        }
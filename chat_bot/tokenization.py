@@ -0,0 +1,99 @@
+import json
+import sys
+import numpy as np
+
+# Bump when the vocabulary file layout changes
+VOCABULARY_FORMAT_VERSION = 1
+
+# Padded message length shared by training and serving
+MAX_SEQUENCE_LENGTH = 100
+
+
+class VocabularyTokenizer:
+    """Text to token ids from a flat vocabulary file, matching Keras Tokenizer.texts_to_sequences.
+
+    The vocabulary is plain JSON, so loading it never unpickles anything, and
+    encode_into writes ids straight into a caller's padded int32 buffer.
+    """
+
+    def __init__(self, words, filters, lower=True, split=' ', oov_index=None):
+        # words[k] has token id k + 1; id 0 is padding
+        self.word_ids = {word: index for index, word in enumerate(words, start=1)}
+        self.lower = lower
+        self.split = split
+        self.oov_index = oov_index
+        self._translate = str.maketrans({c: split for c in filters})
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != VOCABULARY_FORMAT_VERSION:
+            raise ValueError(f"Unsupported vocabulary format in {path}")
+        return cls(data['words'], data['filters'], data['lower'], data['split'], data['oov_index'])
+
+    def tokenize(self, text):
+        """Token ids for one text, unknown words dropped or mapped to the OOV id."""
+        if self.lower:
+            text = text.lower()
+        word_ids = self.word_ids
+        oov_index = self.oov_index
+        ids = []
+        for word in text.translate(self._translate).split(self.split):
+            if word:
+                index = word_ids.get(word, oov_index)
+                if index is not None:
+                    ids.append(index)
+        return ids
+
+    def texts_to_sequences(self, texts):
+        return [self.tokenize(text) for text in texts]
+
+    def encode_into(self, text, out):
+        """Write one text into a zeroed 1-D int32 buffer, post-padded; return the token count.
+
+        Like pad_sequences(padding='post'), long texts keep their last tokens.
+        """
+        ids = self.tokenize(text)[-len(out):]
+        out[:len(ids)] = ids
+        return len(ids)
+
+    def encode_batch(self, texts, maxlen):
+        """Encode texts into a (len(texts), maxlen) int32 matrix and their token counts."""
+        padded = np.zeros((len(texts), maxlen), dtype=np.int32)
+        lengths = [self.encode_into(text, row) for text, row in zip(texts, padded)]
+        return padded, lengths
+
+
+def export_vocabulary(tokenizer, path):
+    """Write a fitted Keras Tokenizer as a flat vocabulary file for VocabularyTokenizer."""
+    if tokenizer.char_level or getattr(tokenizer, 'analyzer', None) is not None:
+        raise ValueError("Only word-level tokenizers with the default analyzer can be exported")
+
+    # Ids at or above num_words are never emitted; Keras maps them to the OOV id
+    # (or drops them), exactly what happens to words missing from the table
+    limit = tokenizer.num_words or len(tokenizer.word_index) + 1
+    words = [None] * (min(limit, len(tokenizer.word_index) + 1) - 1)
+    for word, index in tokenizer.word_index.items():
+        if index < limit:
+            words[index - 1] = word
+
+    data = {
+        'format': VOCABULARY_FORMAT_VERSION,
+        'filters': tokenizer.filters,
+        'lower': tokenizer.lower,
+        'split': tokenizer.split,
+        'oov_index': tokenizer.word_index.get(tokenizer.oov_token),
+        'words': words
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    print(f"Exported {len(words)} words to {path}")
+
+
+if __name__ == '__main__':
+    # python tokenization.py tokenizer.pkl vocabulary.json
+    import pickle
+
+    with open(sys.argv[1], 'rb') as f:
+        export_vocabulary(pickle.load(f), sys.argv[2])
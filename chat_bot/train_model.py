@@ -1,51 +1,21 @@
-# import tensorflow as tf
-# from tensorflow.keras.models import Sequential
-# from tensorflow.keras.layers import Embedding, LSTM, Dense
-# from tensorflow.keras.preprocessing.text import Tokenizer
-# from tensorflow.keras.preprocessing.sequence import pad_sequences
-# import pickle
-
-# # Sample training data
-# queries = [
-#     "I want to lose weight", "How do I gain muscle?", 
-#     "Help me with endurance", "I need better flexibility", 
-#     "Just want to maintain fitness"
-# ]
-# labels = [0, 1, 2, 3, 4]  # Encoded fitness goals
-
-# # Tokenizer and preprocessing
-# tokenizer = Tokenizer(num_words=1000)
-# tokenizer.fit_on_texts(queries)
-# sequences = tokenizer.texts_to_sequences(queries)
-# padded = pad_sequences(sequences, maxlen=10)
-
-# # Save the tokenizer
-# with open('tokenizer.pkl', 'wb') as f:
-#     pickle.dump(tokenizer, f)
-
-# # Build the LSTM model
-# model = Sequential([
-#     Embedding(1000, 64, input_length=10),
-#     LSTM(32),
-#     Dense(5, activation='softmax')
-# ])
-
-# # Compile and train the model
-# model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
-# model.fit(padded, labels, epochs=10)
-
-# # Save the trained model
-# model.save('fitness_classifier.h5')
-# print("Model trained and saved successfully.")
+import argparse
+import glob
+import json
+import os
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Embedding, LSTM, Dense
 from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
 import pickle
 import numpy as np
+from tokenization import MAX_SEQUENCE_LENGTH, export_vocabulary
 
-# Sample training data
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Fitness goals in label order; must match goal_labels in app.py
+GOALS = ['weight_loss', 'muscle_gain', 'endurance', 'flexibility', 'maintenance']
+
+# Sample training data, used when no shards are given
 queries = [
     "I want to lose weight", "How do I gain muscle?", 
     "Help me with endurance", "I need better flexibility", 
@@ -53,37 +23,254 @@ queries = [
 ]
 labels = [0, 1, 2, 3, 4]  # Encoded fitness goals
 
-# Tokenizer and preprocessing
-tokenizer = Tokenizer(num_words=1000)
-tokenizer.fit_on_texts(queries)
-sequences = tokenizer.texts_to_sequences(queries)
-padded = pad_sequences(sequences, maxlen=10)
-
-# Convert padded sequences and labels to numpy arrays
-padded = np.array(padded)
-labels = np.array(labels)
-
-# Save the tokenizer
-with open('tokenizer.pkl', 'wb') as f:
-    pickle.dump(tokenizer, f)
-
-# Print the shapes and types for debugging
-print("Padded shape:", padded.shape)
-print("Padded type:", type(padded))
-print("Labels shape:", labels.shape)
-print("Labels type:", type(labels))
-
-# Build the LSTM model
-model = Sequential([
-    Embedding(1000, 64, input_length=10),
-    LSTM(32),
-    Dense(5, activation='softmax')
-])
-
-# Compile and train the model
-model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
-model.fit(padded, labels, epochs=10)
-
-# Save the trained model
-model.save('fitness_classifier.h5')
-print("Model trained and saved successfully.")
+# Messages are batched with others of similar length, then padded to the bucket
+BUCKET_BOUNDARIES = [8, 16, 32, 64]
+
+def find_shards(patterns):
+    """Expand file globs and directories into sorted .jsonl and .csv shard lists"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        paths.extend(glob.glob(pattern))
+    paths = sorted(set(paths))
+    jsonl = [path for path in paths if path.endswith(('.jsonl', '.json'))]
+    csv = [path for path in paths if path.endswith('.csv')]
+    return jsonl, csv
+
+def _decode_json_line(line):
+    record = json.loads(line.numpy())
+    return str(record.get('text', '')), str(record.get('label', ''))
+
+def _parse_json_line(line):
+    text, label = tf.py_function(_decode_json_line, [line], (tf.string, tf.string))
+    # py_function loses static shapes, which the string ops downstream need
+    text.set_shape([])
+    label.set_shape([])
+    return text, label
+
+def load_examples(jsonl_files, csv_files):
+    """Stream (text, label string) pairs from every shard, reading shards in parallel"""
+    datasets = []
+    if jsonl_files:
+        lines = tf.data.Dataset.from_tensor_slices(jsonl_files).interleave(
+            tf.data.TextLineDataset,
+            cycle_length=AUTOTUNE,
+            num_parallel_calls=AUTOTUNE,
+            deterministic=False
+        )
+        datasets.append(lines.map(
+            _parse_json_line,
+            num_parallel_calls=AUTOTUNE,
+            deterministic=False
+        ))
+    if csv_files:
+        # CSV shards have a header row and text,label columns
+        datasets.append(tf.data.Dataset.from_tensor_slices(csv_files).interleave(
+            lambda path: tf.data.experimental.CsvDataset(
+                path, [tf.string, tf.string], header=True, select_cols=[0, 1]
+            ),
+            cycle_length=AUTOTUNE,
+            num_parallel_calls=AUTOTUNE,
+            deterministic=False
+        ))
+    if not datasets:
+        return tf.data.Dataset.from_tensor_slices(
+            ([str(q) for q in queries], [str(label) for label in labels])
+        )
+    if len(datasets) == 1:
+        return datasets[0]
+    return tf.data.Dataset.sample_from_datasets(datasets, stop_on_empty_dataset=False)
+
+def fit_tokenizer(examples, vocab_size):
+    """Fit a Keras Tokenizer in one streaming pass; only word counts are kept in memory"""
+    tokenizer = Tokenizer(num_words=vocab_size)
+    texts = examples.map(lambda text, label: text, num_parallel_calls=AUTOTUNE)
+    tokenizer.fit_on_texts(text.decode('utf-8') for text in texts.as_numpy_iterator())
+    return tokenizer
+
+def make_label_table():
+    """Labels may be goal ids ("2") or goal names ("endurance"); anything else maps to -1"""
+    keys = [str(i) for i in range(len(GOALS))] + GOALS
+    values = list(range(len(GOALS))) * 2
+    return tf.lookup.StaticHashTable(
+        tf.lookup.KeyValueTensorInitializer(keys, values, value_dtype=tf.int64),
+        default_value=-1
+    )
+
+def make_encoder(tokenizer):
+    """In-graph equivalent of tokenizer.texts_to_sequences, truncated like serving"""
+    words = sorted(
+        (word for word, index in tokenizer.word_index.items() if index < tokenizer.num_words),
+        key=tokenizer.word_index.get
+    )
+    # Index 0 is the out-of-vocabulary bucket, so words[k] maps to k + 1 as in Keras
+    lookup = tf.keras.layers.StringLookup(vocabulary=words, mask_token=None, num_oov_indices=1)
+    escaped = ''.join(
+        {'\t': r'\t', '\n': r'\n'}.get(c, c if c.isalnum() else '\\' + c) for c in tokenizer.filters
+    )
+    oov_index = tokenizer.word_index.get(tokenizer.oov_token)
+
+    def encode(text):
+        if tokenizer.lower:
+            text = tf.strings.lower(text, encoding='utf-8')
+        if escaped:
+            text = tf.strings.regex_replace(text, f'[{escaped}]', tokenizer.split)
+        tokens = tf.strings.split(text, sep=tokenizer.split)
+        tokens = tf.boolean_mask(tokens, tf.strings.length(tokens) > 0)
+        ids = tf.cast(lookup(tokens), tf.int32)
+        if oov_index is None:
+            ids = tf.boolean_mask(ids, ids > 0)
+        else:
+            ids = tf.where(ids > 0, ids, oov_index)
+        # Serving keeps the last MAX_SEQUENCE_LENGTH tokens
+        return ids[-MAX_SEQUENCE_LENGTH:]
+    return encode
+
+def make_dataset(examples, tokenizer, batch_size, shuffle_buffer):
+    """Tokenize, bucket by length, pad and prefetch training batches"""
+    label_table = make_label_table()
+    encode = make_encoder(tokenizer)
+
+    dataset = examples.shuffle(shuffle_buffer) if shuffle_buffer else examples
+    dataset = dataset.map(
+        lambda text, label: (encode(text), label_table.lookup(tf.strings.strip(label))),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=False
+    )
+    dataset = dataset.filter(lambda ids, label: tf.logical_and(label >= 0, tf.size(ids) > 0))
+    dataset = dataset.bucket_by_sequence_length(
+        lambda ids, label: tf.size(ids),
+        bucket_boundaries=BUCKET_BOUNDARIES,
+        bucket_batch_sizes=[batch_size] * (len(BUCKET_BOUNDARIES) + 1),
+        padded_shapes=([None], [])
+    )
+    return dataset.prefetch(AUTOTUNE)
+
+def build_model(vocab_size):
+    # mask_zero makes padding inert, so bucket-padded training batches and the
+    # MAX_SEQUENCE_LENGTH rows used in serving give the same result
+    model = Sequential([
+        Embedding(vocab_size, 64, mask_zero=True),
+        LSTM(32),
+        Dense(len(GOALS), activation='softmax')
+    ])
+    # Batches have variable length; BackupAndRestore needs the weights to exist before fit()
+    model.build((None, None))
+    return model
+
+def train(model_path, tokenizer_path, data=None, epochs=10, batch_size=64,
+          vocab_size=1000, shuffle_buffer=10000, checkpoint_dir='checkpoints',
+          checkpoint_every=1000):
+    """Train the classifier from streamed shards and save it with its tokenizer"""
+    jsonl_files, csv_files = find_shards(data or [])
+    if data and not (jsonl_files or csv_files):
+        raise ValueError("No .jsonl or .csv shards found")
+    examples = load_examples(jsonl_files, csv_files)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    # A resumed run must keep the vocabulary it started with
+    checkpoint_tokenizer = os.path.join(checkpoint_dir, 'tokenizer.pkl')
+    if os.path.exists(checkpoint_tokenizer):
+        with open(checkpoint_tokenizer, 'rb') as f:
+            tokenizer = pickle.load(f)
+        print(f"Resuming with tokenizer from {checkpoint_tokenizer}")
+    else:
+        tokenizer = fit_tokenizer(examples, vocab_size)
+        with open(checkpoint_tokenizer, 'wb') as f:
+            pickle.dump(tokenizer, f)
+    print(f"Vocabulary: {min(len(tokenizer.word_index) + 1, vocab_size)} tokens")
+
+    dataset = make_dataset(examples, tokenizer, batch_size, shuffle_buffer)
+
+    # Build the LSTM model
+    model = build_model(vocab_size)
+
+    # Compile and train the model; BackupAndRestore resumes an interrupted run
+    # from its last checkpoint, including the epoch and step it reached
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    model.fit(
+        dataset,
+        epochs=epochs,
+        callbacks=[tf.keras.callbacks.BackupAndRestore(
+            os.path.join(checkpoint_dir, 'backup'),
+            save_freq=checkpoint_every
+        )]
+    )
+
+    # Save the tokenizer and the trained model
+    with open(tokenizer_path, 'wb') as f:
+        pickle.dump(tokenizer, f)
+    model.save(model_path)
+    os.remove(checkpoint_tokenizer)
+    print("Model trained and saved successfully.")
+    return model, tokenizer
+
+def export_numpy_weights(model, path):
+    """Write the weights as a .npz file for the TensorFlow-free NumPy backend"""
+    embedding = next(layer for layer in model.layers if isinstance(layer, Embedding))
+    lstm = next(layer for layer in model.layers if isinstance(layer, LSTM))
+    dense = next(layer for layer in model.layers if isinstance(layer, Dense))
+
+    # The NumPy forward pass only implements the default LSTM configuration
+    lstm_config = lstm.get_config()
+    if (lstm_config['activation'] != 'tanh' or lstm_config['recurrent_activation'] != 'sigmoid'
+            or lstm_config.get('go_backwards') or not lstm_config.get('use_bias', True)):
+        raise ValueError("Only forward tanh/sigmoid LSTMs with a bias can be exported")
+
+    kernel, recurrent_kernel, bias = lstm.get_weights()
+    dense_kernel, dense_bias = dense.get_weights()
+    np.savez(
+        path,
+        embedding=embedding.get_weights()[0],
+        lstm_kernel=kernel,
+        lstm_recurrent=recurrent_kernel,
+        lstm_bias=bias,
+        dense_kernel=dense_kernel,
+        dense_bias=dense_bias,
+        mask_zero=np.array(bool(embedding.get_config().get('mask_zero')))
+    )
+    print(f"Exported NumPy weights to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the fitness goal classifier.")
+    parser.add_argument('data', nargs='*',
+                        help="JSONL ({\"text\", \"label\"}) or CSV (text,label) shards, globs or directories; "
+                             "the built-in samples are used when omitted")
+    parser.add_argument('--model', default='fitness_classifier.h5')
+    parser.add_argument('--tokenizer', default='tokenizer.pkl')
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--vocab-size', type=int, default=1000)
+    parser.add_argument('--shuffle-buffer', type=int, default=10000)
+    parser.add_argument('--checkpoint-dir', default='checkpoints',
+                        help="Interrupted runs resume from here")
+    parser.add_argument('--checkpoint-every', type=int, default=1000,
+                        help="Checkpoint every N training steps")
+    parser.add_argument('--export-npz', default='fitness_classifier.npz',
+                        help="Where to write weights for CHAT_MODEL_BACKEND=numpy")
+    parser.add_argument('--export-vocab', default='vocabulary.json',
+                        help="Where to write the flat vocabulary used for serving")
+    parser.add_argument('--export-only', action='store_true',
+                        help="Export an already trained model instead of training")
+    args = parser.parse_args()
+
+    if args.export_only:
+        model = tf.keras.models.load_model(args.model)
+        with open(args.tokenizer, 'rb') as f:
+            tokenizer = pickle.load(f)
+    else:
+        model, tokenizer = train(
+            args.model, args.tokenizer, args.data,
+            epochs=args.epochs,
+            batch_size=args.batch_size,
+            vocab_size=args.vocab_size,
+            shuffle_buffer=args.shuffle_buffer,
+            checkpoint_dir=args.checkpoint_dir,
+            checkpoint_every=args.checkpoint_every
+        )
+    export_numpy_weights(model, args.export_npz)
+    export_vocabulary(tokenizer, args.export_vocab)
+
+if __name__ == '__main__':
+    main()
@@ -1,71 +1,129 @@
-from flask import Flask, jsonify
+import json
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import subprocess
+from concurrent.futures.process import BrokenProcessPool
+from worker_pool import ExercisePool, EXERCISE_DURATION, EXERCISES
 
 app = Flask(__name__)
 CORS(app)
 
+# Exercises run headless in long-lived workers that already have their pose models loaded
+pool = ExercisePool()
+
+def exercise_options():
+    """Optional {"target": reps, "duration": seconds} request body"""
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ValueError("request body must be a JSON object")
+    try:
+        target = int(data['target']) if data.get('target') is not None else None
+        duration = float(data.get('duration', EXERCISE_DURATION))
+    except (TypeError, ValueError):
+        raise ValueError("invalid target or duration")
+    if (target is not None and target < 1) or duration <= 0:
+        raise ValueError("target must be at least 1 and duration positive")
+    return target, duration
+
+def run_exercise(name, target=None, duration=EXERCISE_DURATION):
+    """Count an exercise headless in the worker pool and return (returncode, stdout, stderr)
+
+    stdout lists the count after every rep, one per line, as the scripts used to print.
+    """
+    try:
+        reps = pool.run_counter(name, target, duration)
+    except BrokenProcessPool as e:
+        return 1, '', f"Exercise worker crashed: {e}"
+    except Exception as e:
+        return 1, '', str(e)
+    return 0, ''.join(f"{count}\n" for count in reps), ''
+
+def exercise_response(name):
+    try:
+        target, duration = exercise_options()
+    except ValueError as e:
+        return f"An error occurred: {e}", 400
+
+    returncode, stdout, stderr = run_exercise(name, target, duration)
+    if returncode != 0:
+        return f"An error occurred: {stderr}", 500
+    return stdout, 200
+
 # Route for Jumping Jacks
 @app.route('/jumpingjacks', methods=['POST'])  # Change to POST
 def jumping_jacks():
-    try:
-        result = subprocess.run(['python3', 'exercises/jumpingjacks.py'],
-                                check=True,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
-
-        return result.stdout.decode(), 200
-    except subprocess.CalledProcessError as e:
-        return f"An error occurred: {e.stderr.decode()}", 500
-    except FileNotFoundError:
-        return "Python interpreter not found", 500
+    return exercise_response('jumpingjacks')
 
 # Route for Squats
 @app.route('/squats', methods=['POST'])  # Change to POST if needed
 def squats():
-    try:
-        result = subprocess.run(['python3', 'exercises/squats.py'],
-                                check=True,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
-
-        return result.stdout.decode(), 200
-    except subprocess.CalledProcessError as e:
-        return f"An error occurred: {e.stderr.decode()}", 500
-    except FileNotFoundError:
-        return "Python interpreter not found", 500
+    return exercise_response('squats')
 
 # Route for Pushups
 @app.route('/pushups', methods=['POST'])  # Change to POST if needed
 def pushups():
-    try:
-        result = subprocess.run(['python3', 'exercises/pushups.py'],
-                                check=True,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
+    return exercise_response('pushups')
+
+# Default workout when /fullworkout gets no plan
+DEFAULT_WORKOUT = ['jumpingjacks', 'pushups', 'squats']
 
-        return result.stdout.decode(), 200
-    except subprocess.CalledProcessError as e:
-        return f"An error occurred: {e.stderr.decode()}", 500
-    except FileNotFoundError:
-        return "Python interpreter not found", 500
+def parse_workout(steps):
+    """Validate a workout plan: a list of exercise names or {"name", "target", "duration"} objects"""
+    if steps is None:
+        steps = DEFAULT_WORKOUT
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("exercises must be a non-empty list")
+
+    plan = []
+    for step in steps:
+        if isinstance(step, str):
+            step = {'name': step}
+        if not isinstance(step, dict) or not isinstance(step.get('name'), str) or step['name'] not in EXERCISES:
+            raise ValueError(f"Unknown exercise: {step}. Available: {', '.join(EXERCISES)}")
+        try:
+            target = int(step['target']) if step.get('target') is not None else None
+            duration = float(step.get('duration', EXERCISE_DURATION))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid target or duration for {step['name']}")
+        if (target is not None and target < 1) or duration <= 0:
+            raise ValueError(f"Invalid target or duration for {step['name']}")
+        plan.append({'name': step['name'], 'target': target, 'duration': duration})
+    return plan
 
 # Route to start the full workout in sequence
 @app.route('/fullworkout', methods=['POST'])  # Change to POST if needed
 def full_workout():
+    """Run a workout in one worker and stream its progress
+
+    Progress is streamed as newline-delimited JSON, or as Server-Sent Events
+    when the client accepts text/event-stream.
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Request body must be a JSON object"}), 400
     try:
-        # Start with Jumping Jacks
-        subprocess.run(['python3', 'exercises/jumpingjacks.py'], check=True)
-        
-        # Move to Pushups after Jumping Jacks
-        subprocess.run(['python3', 'exercises/pushups.py'], check=True)
-        
-        # Finish with Squats
-        subprocess.run(['python3', 'exercises/squats.py'], check=True)
-
-        return jsonify({"status": "success", "message": "Full workout completed"}), 200
-    except subprocess.CalledProcessError as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        plan = parse_workout(data.get('exercises'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+
+    def generate():
+        for event in pool.stream_workout(plan):
+            if use_sse:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+
+    response = Response(generate(), mimetype='text/event-stream' if use_sse else 'application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5002, debug=True)
+    # Boot the workers before the first request; the reloader would start a second pool
+    pool.start()
+    app.run(host='0.0.0.0', port=5002, debug=True, use_reloader=False)
@@ -1,99 +1,169 @@
 import cv2
-import math
-from tkinter import *
-from PIL import Image, ImageTk
+import logging
 import mediapipe as md
 
+logger = logging.getLogger(__name__)
+
 # Importing necessary libraries
 md_drawing = md.solutions.drawing_utils
 md_drawing_style = md.solutions.drawing_styles
 md_pose = md.solutions.pose
 
-count = 0
-position = None
-
-cap = cv2.VideoCapture(0)
-video_file = None
-
-# Initializing variables and capturing video
-root = Tk()
-root.title("PUSHUP COUNTER")
-root.geometry('500x400+268+82')
-root.configure(bg="#000000")  # Set background color to black
-
-# Creating the Tkinter window
-f1 = LabelFrame(root, bg="#000000")  # Change label frame background to black
-f1.place(relx=0.5, rely=0.5)
-
-label = Label(root, text="Pushup Count: 0", font=("Arial", 24, "bold"), bg="#000000", fg="#FFFFFF")  # Update label colors
-label.pack(pady=10)
-
-# Creating a label for displaying video
-video_label = Label(root, bg="#000000")  # Set background to black
-video_label.pack()
-
-def close():
-    root.destroy()
-
-# Function to close the application
-Button(f1, text="Exit the Application", bg='#FFFFFF', fg='red', font=("Calibri", 14, "bold"), command=close).place(relx=0.5, rely=0.8, anchor="center")  # Center the exit button
+# Settings for the Pose object used for pose estimation
+POSE_OPTIONS = {
+    'min_detection_confidence': 0.5,
+    'min_tracking_confidence': 0.7
+}
 
-# Initializing the Pose object for pose estimation
-pose = md_pose.Pose(
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.7
-)
 
-def update_pushup():
-    global count
-    label.config(text=f"PUSHUP: {count}")
-    label.after(1000, update_pushup)
+class PushupCounter:
+    """Counts pushups one frame at a time, with no GUI involved."""
 
-# Function to update the pushup count every second
-def process_frame():
-    global position, count
+    def __init__(self, pose=None):
+        # A caller-provided pose model is reused and left open
+        self._owns_pose = pose is None
+        self.pose = pose or md_pose.Pose(**POSE_OPTIONS)
+        self.count = 0
+        self.position = None
 
-    success, image = cap.read()
-    if not success:
-        print("Empty Camera")
-        return
+    def process(self, image, draw=False):
+        """Update the count from one BGR camera frame; return the annotated frame if draw is set."""
+        image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
+        result = self.pose.process(image)
 
-    image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-    result = pose.process(image)
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        imlist = []
 
-    imlist = []
-
-    if result.pose_landmarks:
-        md_drawing.draw_landmarks(
-            image, result.pose_landmarks, md_pose.POSE_CONNECTIONS,
-            landmark_drawing_spec=md_drawing_style.get_default_pose_landmarks_style()
-        )
-        for id, im in enumerate(result.pose_landmarks.landmark):
+        if result.pose_landmarks:
             h, w, _ = image.shape
-            X, Y = int(im.x * w), int(im.y * h)
-            imlist.append([id, X, Y])
-
-    if len(imlist) != 0:
-        # Pushup detection logic
-        if imlist[11][2] >= imlist[23][2] and imlist[12][2] >= imlist[24][2]:  # Down position
-            position = "down"
-        if position == "down" and imlist[11][2] < imlist[23][2] and imlist[12][2] < imlist[24][2]:  # Up position
-            position = "up"
-            count += 1
-            print(count)
-
-    frame = ImageTk.PhotoImage(Image.fromarray(image))
-    video_label.config(image=frame)
-    video_label.image = frame
-
-    root.after(1, process_frame)
-
-update_pushup()
-process_frame()
-
-# Updating the pushup count and processing video frames
-root.mainloop()
-
-cap.release()
-cv2.destroyAllWindows()
+            for id, im in enumerate(result.pose_landmarks.landmark):
+                X, Y = int(im.x * w), int(im.y * h)
+                imlist.append([id, X, Y])
+
+        if len(imlist) != 0:
+            # Pushup detection logic
+            if imlist[11][2] >= imlist[23][2] and imlist[12][2] >= imlist[24][2]:  # Down position
+                self.position = "down"
+            if self.position == "down" and imlist[11][2] < imlist[23][2] and imlist[12][2] < imlist[24][2]:  # Up position
+                self.position = "up"
+                self.count += 1
+
+        if not draw:
+            return None
+
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if result.pose_landmarks:
+            md_drawing.draw_landmarks(
+                image, result.pose_landmarks, md_pose.POSE_CONNECTIONS,
+                landmark_drawing_spec=md_drawing_style.get_default_pose_landmarks_style()
+            )
+        return image
+
+    def close(self):
+        if self._owns_pose:
+            self.pose.close()
+
+
+def camera_frames(cap):
+    """Yield frames from an open cv2.VideoCapture.
+
+    A camera has no natural end, so a failed read raises RuntimeError rather
+    than ending the iteration like a finished exercise would.
+    """
+    while True:
+        success, image = cap.read()
+        if not success:
+            logger.error("Empty Camera")
+            raise RuntimeError("Camera stopped delivering frames")
+        yield image
+
+
+def count_exercise(frame_source, result_sink=None, pose=None, target=None, stop_event=None):
+    """Count pushups over any iterable of BGR frames, headless.
+
+    result_sink, if given, is called with the new count after every rep.
+    Counting stops when the source runs out, target reps are reached or
+    stop_event is set; the final count is returned.
+    """
+    counter = PushupCounter(pose)
+    try:
+        for image in frame_source:
+            if stop_event is not None and stop_event.is_set():
+                break
+            previous = counter.count
+            counter.process(image)
+            if counter.count != previous and result_sink:
+                result_sink(counter.count)
+            if target and counter.count >= target:
+                break
+    finally:
+        counter.close()
+    return counter.count
+
+
+def run_viewer():
+    """Tk front end: live video with the running count."""
+    from tkinter import Tk, LabelFrame, Label, Button
+    from PIL import Image, ImageTk
+
+    cap = cv2.VideoCapture(0)
+    counter = PushupCounter()
+
+    # Initializing variables and capturing video
+    root = Tk()
+    root.title("PUSHUP COUNTER")
+    root.geometry('500x400+268+82')
+    root.configure(bg="#000000")  # Set background color to black
+
+    # Creating the Tkinter window
+    f1 = LabelFrame(root, bg="#000000")  # Change label frame background to black
+    f1.place(relx=0.5, rely=0.5)
+
+    label = Label(root, text="Pushup Count: 0", font=("Arial", 24, "bold"), bg="#000000", fg="#FFFFFF")  # Update label colors
+    label.pack(pady=10)
+
+    # Creating a label for displaying video
+    video_label = Label(root, bg="#000000")  # Set background to black
+    video_label.pack()
+
+    def close():
+        root.destroy()
+
+    # Function to close the application
+    Button(f1, text="Exit the Application", bg='#FFFFFF', fg='red', font=("Calibri", 14, "bold"), command=close).place(relx=0.5, rely=0.8, anchor="center")  # Center the exit button
+
+    def update_pushup():
+        label.config(text=f"PUSHUP: {counter.count}")
+        label.after(1000, update_pushup)
+
+    # Function to update the pushup count every second
+    def process_frame():
+        success, image = cap.read()
+        if not success:
+            print("Empty Camera")
+            return
+
+        previous = counter.count
+        image = counter.process(image, draw=True)
+        if counter.count != previous:
+            print(counter.count)
+
+        frame = ImageTk.PhotoImage(Image.fromarray(image))
+        video_label.config(image=frame)
+        video_label.image = frame
+
+        root.after(1, process_frame)
+
+    update_pushup()
+    process_frame()
+
+    # Updating the pushup count and processing video frames
+    root.mainloop()
+
+    cap.release()
+    cv2.destroyAllWindows()
+    counter.close()
+    return counter.count
+
+
+if __name__ == '__main__':
+    run_viewer()
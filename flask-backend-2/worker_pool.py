@@ -0,0 +1,316 @@
+import importlib
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Number of long-lived worker processes running exercises
+EXERCISE_WORKERS = int(os.getenv('EXERCISE_WORKERS', 2))
+
+# Headless exercise runs stop after this many seconds unless a target is reached first
+EXERCISE_DURATION = float(os.getenv('EXERCISE_DURATION', 60))
+
+CAMERA_INDEX = int(os.getenv('CAMERA_INDEX', 0))
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EXERCISES = ('jumpingjacks', 'pushups', 'squats')
+
+# Unused pose models built ahead of time, keyed by their settings. A model keeps
+# smoothing and tracking state from the frames it has seen, so each one serves a
+# single exercise run and is then closed.
+_fresh_poses = {}
+_poses_lock = threading.Lock()
+
+
+def _pose_key(options):
+    return tuple(sorted(options.items()))
+
+
+def warm_pose(options):
+    """Build a pose model for these options unless an unused one is already waiting."""
+    key = _pose_key(options)
+    with _poses_lock:
+        if key in _fresh_poses:
+            return
+    import mediapipe as md
+    pose = md.solutions.pose.Pose(**options)
+    with _poses_lock:
+        if key not in _fresh_poses:
+            _fresh_poses[key] = pose
+            return
+    pose.close()  # Another thread got there first
+
+
+def take_pose(options):
+    """An unused pose model for these options, built now if none was warmed; the caller closes it."""
+    with _poses_lock:
+        pose = _fresh_poses.pop(_pose_key(options), None)
+    if pose is None:
+        import mediapipe as md
+        pose = md.solutions.pose.Pose(**options)
+    return pose
+
+
+def init_worker():
+    """Import the exercise modules and warm a pose model for each of their settings."""
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    for name in EXERCISES:
+        warm_pose(importlib.import_module(f'exercises.{name}').POSE_OPTIONS)
+
+
+def ping():
+    return os.getpid()
+
+
+def run_counter(name, target=None, duration=EXERCISE_DURATION):
+    """Count one exercise headless on the camera; returns the count after every rep."""
+    import cv2
+
+    module = importlib.import_module(f'exercises.{name}')
+    cap = cv2.VideoCapture(CAMERA_INDEX)
+    if not cap.isOpened():
+        raise RuntimeError("Camera not available")
+
+    reps = []
+    pose = take_pose(module.POSE_OPTIONS)
+    stop_event = threading.Event()
+    timer = threading.Timer(duration, stop_event.set) if duration else None
+    if timer:
+        timer.start()
+    try:
+        module.count_exercise(
+            module.camera_frames(cap),
+            result_sink=reps.append,
+            pose=pose,
+            target=target,
+            stop_event=stop_event
+        )
+    finally:
+        if timer:
+            timer.cancel()
+        cap.release()
+        pose.close()
+        # Have a fresh model ready for the next request to this worker
+        threading.Thread(target=warm_pose, args=(module.POSE_OPTIONS,), daemon=True).start()
+    return reps
+
+
+class CameraStream:
+    """Frames from one open camera, shared by every exercise in a workout."""
+
+    def __init__(self, cap, cancel=None):
+        self.cap = cap
+        self.cancel = cancel
+        self.exhausted = False
+
+    def __iter__(self):
+        while not self.exhausted:
+            if self.cancel is not None and self.cancel.is_set():
+                return
+            success, image = self.cap.read()
+            if not success:
+                self.exhausted = True
+                return
+            yield image
+
+
+def prepare_exercise(name):
+    """Import an exercise and warm an unused pose model for it so it can start instantly."""
+    module = importlib.import_module(f'exercises.{name}')
+    warm_pose(module.POSE_OPTIONS)
+    return module
+
+
+def run_workout(plan, progress, cancel=None):
+    """Run a sequence of exercises back to back on one camera, reporting progress.
+
+    plan is a list of {"name", "target", "duration"} steps. Every step gets a
+    pose model that has seen no frames yet; while one exercise runs, the model
+    for the next is built on a helper thread, and the camera stays open across
+    the switch.
+    """
+    import cv2
+
+    started = time.time()
+    results = []
+    cap = cv2.VideoCapture(CAMERA_INDEX)
+    warmer = ThreadPoolExecutor(max_workers=1)
+    try:
+        if not cap.isOpened():
+            raise RuntimeError("Camera not available")
+        stream = CameraStream(cap, cancel)
+        upcoming = warmer.submit(prepare_exercise, plan[0]['name'])
+        finished_at = None
+
+        for index, step in enumerate(plan):
+            module = upcoming.result()
+            name = step['name']
+            step_started = time.time()
+            progress.put({
+                'event': 'start',
+                'index': index,
+                'exercise': name,
+                'target': step.get('target'),
+                'transition_ms': round((step_started - finished_at) * 1000, 1) if finished_at else None
+            })
+
+            def report(count, name=name, step_started=step_started):
+                progress.put({
+                    'event': 'rep',
+                    'exercise': name,
+                    'count': count,
+                    'elapsed': round(time.time() - step_started, 2)
+                })
+
+            # Take this step's model before warming the next, so the warm-up builds a new one
+            pose = take_pose(module.POSE_OPTIONS)
+            if index + 1 < len(plan):
+                upcoming = warmer.submit(prepare_exercise, plan[index + 1]['name'])
+
+            stop_event = threading.Event()
+            timer = threading.Timer(step['duration'], stop_event.set) if step.get('duration') else None
+            if timer:
+                timer.start()
+            try:
+                count = module.count_exercise(
+                    stream,
+                    result_sink=report,
+                    pose=pose,
+                    target=step.get('target'),
+                    stop_event=stop_event
+                )
+            finally:
+                if timer:
+                    timer.cancel()
+                pose.close()
+            finished_at = time.time()
+
+            results.append({'exercise': name, 'count': count, 'seconds': round(finished_at - step_started, 2)})
+            progress.put({'event': 'complete', 'index': index, **results[-1]})
+
+            if cancel is not None and cancel.is_set():
+                raise RuntimeError("Workout cancelled")
+            if stream.exhausted:
+                raise RuntimeError("Camera stopped delivering frames")
+
+        progress.put({'event': 'done', 'results': results, 'seconds': round(time.time() - started, 2)})
+        return results
+    except Exception as e:
+        progress.put({'event': 'error', 'message': str(e), 'results': results})
+        raise
+    finally:
+        # Leave a fresh model behind for the next request to this worker
+        warmer.submit(prepare_exercise, plan[0]['name'])
+        warmer.shutdown(wait=False)
+        cap.release()
+
+
+class ExercisePool:
+    """Long-lived worker processes with cv2 and mediapipe already loaded."""
+
+    def __init__(self, workers=EXERCISE_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def _create(self):
+        # spawn keeps Tk and mediapipe state out of the Flask process
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker
+        )
+        # Start every worker now so no request waits for an interpreter to boot
+        for future in [executor.submit(ping) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def start(self):
+        """Start the workers if they are not running yet."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create()
+            return self._executor
+
+    def _discard(self, executor):
+        # A worker died (e.g. a native crash), which breaks the whole pool
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        executor = self.start()
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self.start()
+            return executor, executor.submit(fn, *args)
+
+    def submit(self, fn, *args):
+        return self._submit(fn, *args)[1]
+
+    def call(self, fn, *args):
+        """Run fn in a worker and wait for its result, replacing the pool if it broke."""
+        executor, future = self._submit(fn, *args)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+
+    def run_counter(self, name, target=None, duration=EXERCISE_DURATION):
+        """Count an exercise headless in a worker and wait for it."""
+        return self.call(run_counter, name, target, duration)
+
+    def _get_manager(self):
+        # Proxied queues and events let a worker report back while it runs
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context('spawn').Manager()
+            return self._manager
+
+    def stream_workout(self, plan, poll_interval=1.0):
+        """Run a workout in one worker and yield its progress events as they happen.
+
+        Closing the generator (e.g. the client disconnected) cancels the workout.
+        """
+        manager = self._get_manager()
+        progress = manager.Queue()
+        cancel = manager.Event()
+        executor, future = self._submit(run_workout, plan, progress, cancel)
+        try:
+            while True:
+                try:
+                    event = progress.get(timeout=poll_interval)
+                except queue.Empty:
+                    if not future.done():
+                        continue
+                    error = future.exception()
+                    if isinstance(error, BrokenProcessPool):
+                        self._discard(executor)
+                    if error is not None:
+                        yield {'event': 'error', 'message': f"Workout worker failed: {error}"}
+                    return
+                yield event
+                if event['event'] in ('done', 'error'):
+                    return
+        finally:
+            cancel.set()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
@@ -3,24 +3,23 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import importlib.util
+import json
 import os
 import sys
 import time
 import cv2
 import logging
-import platform
 import socket
 import threading
 import redis
 import atexit
 import signal
-import numpy as np
-import mediapipe as mp
-from mediapipe import solutions
-from mediapipe.framework.formats import landmark_pb2
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_style = mp.solutions.drawing_styles
+from capture import start_capture, stop_capture, capture_stats
+from pose_stage import stop_pose_stage, pose_stage_stats
+from sessions import SessionManager
+from stream import StreamHub, STREAM_PROFILES, DEFAULT_PROFILE
+from overlay import OverlayRenderer
+from metrics import metrics, start_log_reporter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -48,15 +47,31 @@ limiter = Limiter(
     default_limits=["200 per day", "50 per hour"]
 )
 
-# Global camera lock to prevent concurrent access
-camera_lock = threading.Lock()
+# Exercise sessions run on a managed worker pool with per-session state
+sessions = SessionManager(max_workers=int(os.getenv('EXERCISE_WORKERS', 4)))
 
-# Global variables for exercise tracking
-current_exercise = None
-exercise_count = 0
-exercise_feedback = ""
-camera = None
-camera_initialized = False
+# One JPEG encoder per watched session, shared by all of its viewers
+stream_hub = StreamHub()
+
+# Drawing styles and rendered text are cached once and shared by every encoder
+overlay = OverlayRenderer()
+
+
+def stream_samples(key):
+    """One metric sample per running stream encoder."""
+    return [({'stream': stream}, stats[key]) for stream, stats in stream_hub.encoder_stats().items()]
+
+
+metrics.collect('pose_stream_viewers', 'Viewers connected to each stream', lambda: stream_samples('viewers'))
+metrics.collect('pose_stream_queue_depth', 'Deepest viewer queue of each stream', lambda: stream_samples('queue_depth'))
+metrics.collect('pose_stream_fps', 'Frames per second sent by each stream', lambda: stream_samples('fps'))
+
+# Periodic metric snapshots in the log when METRICS_LOG_INTERVAL is set
+start_log_reporter()
+
+# Exercise modules are imported once and reused by every session
+exercise_modules = {}
+exercise_modules_lock = threading.Lock()
 
 # Allowed exercise scripts
 ALLOWED_SCRIPTS = {
@@ -69,190 +84,75 @@ ALLOWED_SCRIPTS = {
     'plank': 'plank'
 }
 
+def load_exercise_module(exercise):
+    """Import an exercise module once and cache it."""
+    with exercise_modules_lock:
+        module = exercise_modules.get(exercise)
+        if module is None:
+            module_name = f'exercises.{ALLOWED_SCRIPTS[exercise]}'
+            spec = importlib.util.spec_from_file_location(
+                module_name,
+                os.path.join(os.path.dirname(__file__), f'exercises/{ALLOWED_SCRIPTS[exercise]}.py')
+            )
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            exercise_modules[exercise] = module
+        return module
+
 def init_camera():
-    """Initialize the camera with proper configuration."""
-    global camera, camera_initialized
-    
-    with camera_lock:
-        if camera_initialized and camera and camera.isOpened():
-            return True  # Camera already initialized
-            
-        try:
-            # Release existing camera if any
-            if camera:
-                camera.release()
-                camera = None
-            
-            # Try different camera indices
-            for i in range(0, 4):  # Try up to 4 camera indices
-                try:
-                    if platform.system() == 'Darwin':
-                        camera = cv2.VideoCapture(i, cv2.CAP_AVFOUNDATION)
-                    else:
-                        camera = cv2.VideoCapture(i)
-                    
-                    if camera.isOpened():
-                        # Set camera properties
-                        camera.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-                        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-                        camera.set(cv2.CAP_PROP_FPS, 30)
-                        
-                        # Test camera by reading a frame
-                        ret, frame = camera.read()
-                        if ret and frame is not None:
-                            logger.info(f"Successfully initialized camera at index {i}")
-                            camera_initialized = True
-                            return True
-                        else:
-                            camera.release()
-                            camera = None
-                except Exception as e:
-                    logger.warning(f"Failed to initialize camera at index {i}: {e}")
-                    if camera:
-                        camera.release()
-                        camera = None
-            
-            logger.error("Could not initialize any camera")
-            camera_initialized = False
-            return False
-            
-        except Exception as e:
-            logger.error(f"Error initializing camera: {e}")
-            camera_initialized = False
-            return False
+    """Initialize the camera and start the shared capture thread."""
+    return start_capture() is not None
 
-def get_camera():
-    """Get the camera instance, initializing if necessary."""
-    with camera_lock:
-        if not camera_initialized or not camera or not camera.isOpened():
-            if not init_camera():
-                raise Exception("Camera not available")
-        return camera
-
-def generate_frames():
-    """Video streaming generator function."""
-    consecutive_errors = 0
-    max_consecutive_errors = 5
-    frame_interval = 0.033  # ~30fps
-    last_frame_time = 0
-    frame_buffer = None
-    pose = mp_pose.Pose(
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5,
-        model_complexity=1
+def draw_overlay(frame, record, session_id=None):
+    """Draw landmarks, rep count and feedback for the watched session onto a frame."""
+    session = sessions.get(session_id) if session_id else sessions.latest()
+    overlay.draw(
+        frame,
+        record.landmarks,
+        session.count if session else 0,
+        session.feedback if session else ""
     )
-    
-    while True:
-        try:
-            current_time = time.time()
-            if current_time - last_frame_time < frame_interval:
-                time.sleep(0.001)  # Short sleep to prevent CPU overuse
+
+def generate_frames(session_id=None, profile=DEFAULT_PROFILE):
+    """Video streaming generator function.
+
+    Every viewer of the same session and profile shares one encoder, which renders and
+    JPEG-encodes each frame once; this generator only drains its own queue.
+    """
+    try:
+        encoder, client = stream_hub.connect(
+            session_id,
+            lambda frame, record: draw_overlay(frame, record, session_id),
+            profile=profile
+        )
+    except Exception as e:
+        logger.error(f"Camera not available: {str(e)}")
+        return
+
+    try:
+        while True:
+            chunk = client.get(timeout=1.0)
+            if chunk is None:
+                if client.closed or not encoder.is_alive():
+                    break
                 continue
-                
-            with camera_lock:
-                camera = get_camera()
-                if not camera or not camera.isOpened():
-                    logger.error("Camera not available")
-                    consecutive_errors += 1
-                    if consecutive_errors >= max_consecutive_errors:
-                        logger.error("Too many consecutive camera errors, stopping stream")
-                        break
-                    time.sleep(1)  # Wait before retrying
-                    continue
-                
-                # Clear the buffer by reading multiple frames
-                for _ in range(2):
-                    camera.grab()
-                success, frame = camera.read()
-                
-                if not success:
-                    logger.warning("Failed to read frame from camera")
-                    consecutive_errors += 1
-                    if consecutive_errors >= max_consecutive_errors:
-                        logger.error("Too many consecutive frame read errors, stopping stream")
-                        break
-                    time.sleep(0.1)  # Short delay before retrying
-                    continue
-                
-                consecutive_errors = 0  # Reset error count on successful frame read
-                last_frame_time = current_time
-                
-                # Flip the frame horizontally for a later selfie-view display
-                frame = cv2.flip(frame, 1)
-                
-                # Process frame for pose detection
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame_rgb.flags.writeable = False
-                results = pose.process(frame_rgb)
-                frame_rgb.flags.writeable = True
-                
-                # Draw pose landmarks if detected
-                if results.pose_landmarks:
-                    mp_drawing.draw_landmarks(
-                        frame,
-                        results.pose_landmarks,
-                        mp_pose.POSE_CONNECTIONS,
-                        landmark_drawing_spec=mp_drawing_style.get_default_pose_landmarks_style()
-                    )
-                    # Add text to indicate person detected
-                    cv2.putText(frame, "Person Detected", (10, 30),
-                              cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                else:
-                    cv2.putText(frame, "No Person Detected", (10, 30),
-                              cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                
-                # Draw exercise count and feedback
-                cv2.putText(frame, f'Count: {exercise_count}', (10, 70), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                if exercise_feedback:
-                    # Split feedback into multiple lines if too long
-                    words = exercise_feedback.split()
-                    lines = []
-                    current_line = []
-                    for word in words:
-                        current_line.append(word)
-                        if len(' '.join(current_line)) > 30:  # max chars per line
-                            lines.append(' '.join(current_line[:-1]))
-                            current_line = [word]
-                    if current_line:
-                        lines.append(' '.join(current_line))
-                    
-                    for i, line in enumerate(lines):
-                        cv2.putText(frame, line, (10, 100 + i*30),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                
-                # Convert frame to jpg with error handling
-                try:
-                    # Only encode if the frame has changed
-                    if frame_buffer is None or not np.array_equal(frame, frame_buffer):
-                        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                        if not ret:
-                            logger.warning("Failed to encode frame")
-                            continue
-                        frame_buffer = frame.copy()
-                        frame_bytes = buffer.tobytes()
-                        
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                except Exception as e:
-                    logger.error(f"Error encoding frame: {str(e)}")
-                    continue
-                
-        except Exception as e:
-            logger.error(f"Error in generate_frames: {str(e)}")
-            consecutive_errors += 1
-            if consecutive_errors >= max_consecutive_errors:
-                logger.error("Too many consecutive errors, stopping stream")
-                break
-            time.sleep(1)  # Wait before retrying
-    pose.close()
+            yield chunk
+    finally:
+        stream_hub.disconnect(encoder, client)
 
 @app.route('/video_feed')
 @limiter.limit("10 per second")
 def video_feed():
     """Video streaming route."""
+    profile = request.args.get('quality', DEFAULT_PROFILE)
+    if profile not in STREAM_PROFILES:
+        return jsonify({
+            'error': f"Unknown quality '{profile}'",
+            'available': list(STREAM_PROFILES)
+        }), 400
+
     try:
-        response = Response(generate_frames(),
+        response = Response(generate_frames(request.args.get('session'), profile),
                           mimetype='multipart/x-mixed-replace; boundary=frame')
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
@@ -266,63 +166,95 @@ def video_feed():
 @app.route('/status')
 @limiter.limit("10 per second")
 def get_status():
-    """Get current exercise status."""
-    return jsonify({
-        'count': exercise_count,
-        'feedback': exercise_feedback
-    })
+    """Get the status of the most recent exercise session."""
+    session = sessions.latest()
+    status = session.to_dict() if session else {'count': 0, 'feedback': ''}
+    status['camera'] = capture_stats()
+    status['pose'] = pose_stage_stats()
+    status['streams'] = stream_hub.stats()
+    status['latency_ms'] = metrics.percentiles()
+    return jsonify(status)
+
+@app.route('/metrics')
+@limiter.exempt
+def get_metrics():
+    """Pipeline latency histograms, frame rates, drops and queue depths for Prometheus."""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/status/<session_id>')
+@limiter.limit("10 per second")
+def get_session_status(session_id):
+    """Get live progress of one exercise session."""
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown session'}), 404
+    return jsonify(session.to_dict())
+
+def generate_events(session):
+    """Server-Sent Events generator that pushes a session's changes as they happen."""
+    version = -1
+    while True:
+        event = session.wait_for_change(version, timeout=15)
+        if event is None:
+            # Comment line keeps proxies from closing an idle connection
+            yield ': keep-alive\n\n'
+            continue
+        version = event['version']
+        yield f"id: {version}\nevent: status\ndata: {json.dumps(event)}\n\n"
+        if event['state'] in ('finished', 'failed'):
+            yield f"event: end\ndata: {json.dumps(session.to_dict())}\n\n"
+            break
+
+@app.route('/events')
+@app.route('/events/<session_id>')
+@limiter.limit("30 per minute")
+def session_events(session_id=None):
+    """Push channel for rep count, feedback and form status changes."""
+    session = sessions.get(session_id) if session_id else sessions.latest()
+    if session is None:
+        return jsonify({'error': 'Unknown session'}), 404
+    response = Response(generate_events(session), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/<exercise>', methods=['POST'])
 @limiter.limit("10 per minute")
 def start_exercise(exercise):
-    """Start a specific exercise."""
-    global current_exercise, exercise_count, exercise_feedback
-    
+    """Start a specific exercise and return its session id immediately."""
     if exercise not in ALLOWED_SCRIPTS:
         return jsonify({'error': 'Invalid exercise'}), 400
     
     try:
-        # Reset exercise state
-        exercise_count = 0
-        exercise_feedback = "Starting exercise..."
-        current_exercise = exercise
+        module = load_exercise_module(exercise)
         
-        # Import the exercise module
-        module_name = f'exercises.{ALLOWED_SCRIPTS[exercise]}'
-        spec = importlib.util.spec_from_file_location(
-            module_name,
-            os.path.join(os.path.dirname(__file__), f'exercises/{ALLOWED_SCRIPTS[exercise]}.py')
+        # Run the counting loop on the worker pool, reporting into the session
+        session = sessions.start(
+            exercise,
+            lambda update_state: module.count_exercise(update_callback=update_state)
         )
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
         
-        # Run the exercise with a callback to update state
-        def update_state(count, feedback):
-            global exercise_count, exercise_feedback
-            exercise_count = count
-            exercise_feedback = feedback
-        
-        # Run the exercise with the update callback
-        result = module.count_exercise(update_callback=update_state)
-        
-        return jsonify(result)
+        return jsonify({
+            'session_id': session.id,
+            'state': session.state,
+            'status_url': f'/status/{session.id}',
+            'events_url': f'/events/{session.id}'
+        }), 202
     except Exception as e:
-        logger.error(f"Error running exercise {exercise}: {str(e)}")
+        logger.error(f"Error starting exercise {exercise}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 def cleanup():
     """Clean up resources."""
-    global camera, camera_initialized
-    with camera_lock:
-        try:
-            if camera:
-                camera.release()
-                camera = None
-            camera_initialized = False
-            cv2.destroyAllWindows()
-            logger.info("Cleaned up camera resources")
-        except Exception as e:
-            logger.error(f"Error during cleanup: {e}")
+    try:
+        sessions.shutdown()
+        stream_hub.stop_all()
+        stop_pose_stage()
+        stop_capture()
+        cv2.destroyAllWindows()
+        logger.info("Cleaned up camera resources")
+    except Exception as e:
+        logger.error(f"Error during cleanup: {e}")
 
 def is_port_in_use(port):
     """Check if a port is already in use."""
@@ -0,0 +1,180 @@
+import contextlib
+import math
+import time
+import cv2
+import numpy as np
+
+# Kept before any patching so recorded fixtures can still be decoded
+RealVideoCapture = cv2.VideoCapture
+
+
+class ClipFrames:
+    """Frames of a recorded clip, decoded on demand and scaled to one resolution."""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._capture = RealVideoCapture(path)
+        if not self._capture.isOpened():
+            raise Exception(f"Could not open video file {path}")
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+    def read(self):
+        success, frame = self._capture.read()
+        if not success or frame is None:
+            return None
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def rewind(self):
+        self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        self._capture.release()
+
+
+class SyntheticFrames:
+    """A stick figure doing jumping jacks on a textured background, identical on every run.
+
+    MediaPipe may not find a person in it, which keeps the detector running on
+    every frame; use recorded clips to benchmark the tracking path.
+    """
+
+    def __init__(self, size, fps=30.0, frames=300, period=1.0):
+        self.size = size
+        self.fps = fps
+        self.frames = frames
+        self.period = period  # Seconds per jumping jack
+        self._index = 0
+        width, height = size
+        rng = np.random.default_rng(0)
+        gradient = np.linspace(60, 160, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+        noise = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+        self._background = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+    def read(self):
+        if self._index >= self.frames:
+            return None
+        frame = self._background.copy()
+        self._draw_figure(frame, self._index / self.fps)
+        self._index += 1
+        return frame
+
+    def _draw_figure(self, frame, t):
+        width, height = self.size
+        scale = height / 720
+        thickness = max(2, round(14 * scale))
+        color = (40, 80, 200)
+        spread = 0.5 - 0.5 * math.cos(2 * math.pi * t / self.period)  # 0 closed, 1 open
+
+        cx = width // 2
+        head = (cx, round(height * 0.2))
+        neck = (cx, round(height * 0.28))
+        hip = (cx, round(height * 0.55))
+        arm = height * 0.22
+        leg = height * 0.32
+        arm_angle = math.radians(-60 + 200 * spread)  # Hanging down to raised overhead
+        leg_angle = math.radians(5 + 25 * spread)
+
+        cv2.circle(frame, head, round(45 * scale), color, -1)
+        cv2.line(frame, neck, hip, color, thickness)
+        for side in (-1, 1):
+            hand = (round(cx + side * arm * math.cos(arm_angle)), round(neck[1] - arm * math.sin(arm_angle)))
+            foot = (round(cx + side * leg * math.sin(leg_angle)), round(hip[1] + leg * math.cos(leg_angle)))
+            cv2.line(frame, neck, hand, color, thickness)
+            cv2.line(frame, hip, foot, color, thickness)
+
+    def rewind(self):
+        self._index = 0
+
+    def release(self):
+        pass
+
+
+class FakeVideoCapture:
+    """Stands in for cv2.VideoCapture and replays a fixture.
+
+    Frames come from a ClipFrames or SyntheticFrames source. With realtime set,
+    read() is paced to the fixture's frame rate like a camera; otherwise frames
+    are returned as fast as they are asked for. The time of every read() is
+    kept in read_times so per-frame latency can be measured from outside.
+    """
+
+    def __init__(self, frames, max_frames=None, loop=False, realtime=False):
+        self.frames = frames
+        self.fps = frames.fps
+        self.max_frames = max_frames
+        self.loop = loop
+        self.realtime = realtime
+        self.frames_read = 0
+        self.read_times = []
+        self.exhausted = False
+        self._opened = True
+        self._started = None
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        now = time.perf_counter()
+        if self.realtime:
+            if self._started is None:
+                self._started = now
+            delay = self._started + self.frames_read / self.fps - now
+            if delay > 0:
+                time.sleep(delay)
+                now = time.perf_counter()
+        self.read_times.append(now)
+
+        frame = None
+        if self._opened and (self.max_frames is None or self.frames_read < self.max_frames):
+            frame = self.frames.read()
+            if frame is None and self.loop:
+                self.frames.rewind()
+                frame = self.frames.read()
+        if frame is None:
+            self.exhausted = True
+            return False, None
+        self.frames_read += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.frames_read * 1000.0 / self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frames_read)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.frames.size[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.frames.size[1])
+        return 0.0
+
+    def set(self, prop, value):
+        # The fixture decides the resolution and frame rate
+        return False
+
+    def release(self):
+        self._opened = False
+
+
+@contextlib.contextmanager
+def patched_camera(make_capture):
+    """Route every cv2.VideoCapture(...) to make_capture() and disable the HighGUI calls."""
+    patches = {
+        'VideoCapture': lambda *args, **kwargs: make_capture(),
+        'imshow': lambda *args, **kwargs: None,
+        'waitKey': lambda *args, **kwargs: -1,
+        'destroyAllWindows': lambda *args, **kwargs: None,
+        'namedWindow': lambda *args, **kwargs: None
+    }
+    originals = {name: getattr(cv2, name) for name in patches}
+    for name, replacement in patches.items():
+        setattr(cv2, name, replacement)
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(cv2, name, original)
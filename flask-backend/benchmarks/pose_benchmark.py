@@ -0,0 +1,363 @@
+"""Benchmark the pose pipeline on recorded or synthetic clips.
+
+    python benchmarks/pose_benchmark.py run --fixtures clips/ --output base.json
+    python benchmarks/pose_benchmark.py compare base.json head.json
+
+Every configuration runs in a fresh process with cv2.VideoCapture replaced by a
+fake camera replaying the fixture, so results do not depend on a webcam and
+peak RSS belongs to that configuration alone.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCHMARK_DIR)
+DEFAULT_FIXTURES = os.path.join(BENCHMARK_DIR, 'fixtures')
+
+# Counters that read landmarks through a VideoFileSource
+COUNTER_TARGETS = ['pushups', 'squats', 'plank', 'jumpingjacks', 'yoga']
+
+# Hold-pose scripts that open the camera and show a window themselves
+HOLD_TARGETS = {'tree_pose': 'count_tree_pose', 'triangle_pose': 'count_triangle_pose'}
+
+# generate_frames(): capture, pose stage, overlay and JPEG encoding together
+STREAM_TARGET = 'stream'
+
+TARGETS = COUNTER_TARGETS + list(HOLD_TARGETS) + [STREAM_TARGET]
+
+# Metrics compared between runs and which direction is better
+COMPARED_METRICS = [
+    ('fps', 'higher'),
+    ('latency_ms.p95', 'lower'),
+    ('cpu_ms_per_frame', 'lower'),
+    ('peak_rss_mb', 'lower')
+]
+
+
+@contextlib.contextmanager
+def pose_overrides(**overrides):
+    """Force settings onto every mp.solutions.pose.Pose built inside the block."""
+    import mediapipe as mp
+
+    pose_module = mp.solutions.pose
+    original = pose_module.Pose
+
+    def make_pose(*args, **kwargs):
+        return original(*args, **dict(kwargs, **overrides))
+
+    pose_module.Pose = make_pose
+    try:
+        yield
+    finally:
+        pose_module.Pose = original
+
+
+def latency_summary(seconds):
+    """Percentiles of a list of durations, in milliseconds."""
+    import numpy as np
+
+    if not seconds:
+        return None
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'mean': round(float(ms.mean()), 3),
+        'max': round(float(ms.max()), 3)
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Not available on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_case(case):
+    """Run one configuration in this (fresh) process and return its measurements."""
+    setup_started = time.perf_counter()
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    if BENCHMARK_DIR not in sys.path:
+        sys.path.insert(0, BENCHMARK_DIR)
+
+    import importlib
+    from unittest import mock
+    from fake_camera import ClipFrames, SyntheticFrames, FakeVideoCapture, patched_camera
+    from metrics import metrics, FRAME_AGE_SECONDS
+
+    target = case['target']
+    size = (case['width'], case['height'])
+    is_stream = target == STREAM_TARGET
+    captures = []
+
+    def make_capture():
+        if case['fixture'] == 'synthetic':
+            frames = SyntheticFrames(size, fps=case['fps'], frames=case['frames'])
+        else:
+            frames = ClipFrames(case['fixture'], size)
+        # The stream is paced like a live camera and loops until enough frames went out
+        capture = FakeVideoCapture(
+            frames,
+            max_frames=None if is_stream else case['frames'],
+            loop=is_stream,
+            realtime=is_stream
+        )
+        captures.append(capture)
+        return capture
+
+    if is_stream:
+        module = importlib.import_module('app')
+    else:
+        module = importlib.import_module(f'exercises.{target}')
+    setup_seconds = time.perf_counter() - setup_started
+
+    result = None
+    output_times = []
+    overrides = {'model_complexity': case['model_complexity'], 'smooth_landmarks': case['smoothing']}
+    with pose_overrides(**overrides), patched_camera(make_capture):
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        if is_stream:
+            frames = module.generate_frames(profile=case['profile'])
+            try:
+                for _ in frames:
+                    output_times.append(time.perf_counter())
+                    if len(output_times) >= case['frames']:
+                        break
+            finally:
+                frames.close()
+                module.cleanup()
+        elif target in HOLD_TARGETS:
+            # The one-second pause after each detected pose is wall time, not work
+            with mock.patch('time.sleep'):
+                result = getattr(module, HOLD_TARGETS[target])()
+        else:
+            from sources import VideoFileSource
+            result = module.count_exercise(source=VideoFileSource(case['fixture']))
+        finished = time.perf_counter()
+        cpu_seconds = time.process_time() - cpu_started
+
+    if is_stream:
+        # Time between frames reaching the viewer
+        frame_times = output_times
+        frame_count = len(output_times)
+    else:
+        # Each read() marks the end of the previous frame's processing
+        read_times = captures[-1].read_times if captures else []
+        frame_times = read_times[:-1] + [finished] if read_times else []
+        frame_count = captures[-1].frames_read if captures else 0
+    intervals = [b - a for a, b in zip(frame_times, frame_times[1:])]
+    busy = frame_times[-1] - frame_times[0] if len(frame_times) > 1 else 0.0
+
+    return dict(
+        case,
+        frames=frame_count,
+        seconds=round(finished - started, 3),
+        fps=round(len(intervals) / busy, 2) if busy else 0.0,
+        latency_ms=latency_summary(intervals),
+        first_frame_ms=round((frame_times[0] - started) * 1000, 3) if frame_times else None,
+        cpu_seconds=round(cpu_seconds, 3),
+        cpu_ms_per_frame=round(cpu_seconds * 1000 / frame_count, 3) if frame_count else None,
+        peak_rss_mb=peak_rss_mb(),
+        setup_seconds=round(setup_seconds, 3),
+        stages=metrics.percentiles(),
+        frame_age=metrics.percentiles(FRAME_AGE_SECONDS),
+        result=result if isinstance(result, (dict, str)) else None
+    )
+
+
+def run_isolated(case):
+    """Run a case in its own spawned process; failures become an error entry."""
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            return pool.submit(run_case, case).result()
+    except Exception as e:
+        return dict(case, error=str(e))
+
+
+def case_key(result):
+    """Identifies the same configuration across result files."""
+    fixture = result['fixture'] if result['fixture'] == 'synthetic' else os.path.basename(result['fixture'])
+    smoothing = 'on' if result['smoothing'] else 'off'
+    return (f"{result['target']} {fixture} complexity={result['model_complexity']} "
+            f"{result['width']}x{result['height']} smoothing={smoothing}")
+
+
+def parse_resolution(value):
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Resolution must look like 1280x720, got {value!r}")
+    return width, height
+
+
+def environment():
+    """What produced a result file, so comparisons across machines can be spotted."""
+    import cv2
+    import mediapipe as mp
+    import numpy as np
+
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=BASE_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain')),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'mediapipe': getattr(mp, '__version__', 'unknown'),
+        'numpy': np.__version__
+    }
+
+
+def run(args):
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    from score_videos import find_clips
+
+    fixtures = find_clips(args.fixtures) if args.fixtures else []
+    if not args.fixtures and os.path.isdir(DEFAULT_FIXTURES):
+        fixtures = find_clips([DEFAULT_FIXTURES])
+    if not fixtures or args.synthetic:
+        fixtures.append('synthetic')
+
+    cases = [
+        {
+            'target': target,
+            'fixture': fixture,
+            'model_complexity': complexity,
+            'width': width,
+            'height': height,
+            'smoothing': smoothing == 'on',
+            'frames': args.frames,
+            'fps': args.fps,
+            'profile': args.profile
+        }
+        for target, fixture, complexity, (width, height), smoothing in itertools.product(
+            args.targets, fixtures, args.complexity, args.resolution, args.smoothing
+        )
+    ]
+
+    results = []
+    for index, case in enumerate(cases, 1):
+        result = run_isolated(case)
+        results.append(result)
+        if 'error' in result:
+            logger.error(f"[{index}/{len(cases)}] {case_key(result)}: {result['error']}")
+        else:
+            logger.info(f"[{index}/{len(cases)}] {case_key(result)}: {result['fps']} fps, "
+                        f"p95 {result['latency_ms']['p95'] if result['latency_ms'] else '-'} ms, "
+                        f"peak RSS {result['peak_rss_mb']} MB")
+
+    report = json.dumps({'environment': environment(), 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+    return 1 if any('error' in result for result in results) else 0
+
+
+def metric_value(result, path):
+    value = result
+    for part in path.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(args):
+    """Print changes between two result files; exit 1 if anything regressed past the tolerance."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    base_results = {case_key(r): r for r in baseline['results'] if 'error' not in r}
+    regressions = 0
+    rows = []
+    for result in candidate['results']:
+        key = case_key(result)
+        base = base_results.get(key)
+        if base is None or 'error' in result:
+            rows.append((key, '-', '-', '-', '-', 'error' if 'error' in result else 'new'))
+            continue
+        for metric, better in COMPARED_METRICS:
+            before, after = metric_value(base, metric), metric_value(result, metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = change < -args.tolerance if better == 'higher' else change > args.tolerance
+            regressions += worse
+            rows.append((key, metric, before, after, f"{change:+.1%}", 'REGRESSION' if worse else ''))
+
+    if baseline['environment'].get('processor') != candidate['environment'].get('processor'):
+        logger.warning("Result files come from different machines; differences may not be meaningful")
+
+    widths = [max(len(str(row[i])) for row in rows + [('case', 'metric', 'base', 'new', 'change', '')])
+              for i in range(6)]
+    for row in [('case', 'metric', 'base', 'new', 'change', '')] + rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip())
+    print(f"\n{regressions} regression(s) beyond {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pose pipeline with a fake camera.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Benchmark every configuration and write JSON results")
+    run_parser.add_argument('--targets', nargs='+', choices=TARGETS, default=TARGETS)
+    run_parser.add_argument('--fixtures', nargs='+',
+                            help=f"Video files or directories (default: {DEFAULT_FIXTURES} if present)")
+    run_parser.add_argument('--synthetic', action='store_true',
+                            help="Also run the synthetic clip when recorded fixtures are given")
+    run_parser.add_argument('--complexity', nargs='+', type=int, choices=[0, 1, 2], default=[0, 1, 2])
+    run_parser.add_argument('--resolution', nargs='+', type=parse_resolution,
+                            default=[(640, 360), (1280, 720)])
+    run_parser.add_argument('--smoothing', nargs='+', choices=['on', 'off'], default=['on', 'off'])
+    run_parser.add_argument('--frames', type=int, default=150, help="Frames per configuration")
+    run_parser.add_argument('--fps', type=float, default=30.0, help="Frame rate of the synthetic clip")
+    run_parser.add_argument('--profile', default='high', help="Stream profile for the stream target")
+    run_parser.add_argument('--output', help="Write JSON here instead of stdout")
+
+    compare_parser = commands.add_parser('compare', help="Compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--tolerance', type=float, default=0.10,
+                                help="Relative change allowed before it counts as a regression")
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import cv2
+import logging
+import os
+import platform
+import threading
+import time
+import numpy as np
+from metrics import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Number of frames kept in the shared ring buffer
+RING_BUFFER_SIZE = 8
+
+# Requested camera mode; stream profiles and pose inference scale down from this
+CAMERA_WIDTH = int(os.getenv('CAMERA_WIDTH', 1280))
+CAMERA_HEIGHT = int(os.getenv('CAMERA_HEIGHT', 720))
+CAMERA_FPS = int(os.getenv('CAMERA_FPS', 30))
+
+
+class FrameRingBuffer:
+    """Fixed-size ring of preallocated frame slots shared by every consumer.
+
+    A single writer (the capture thread) copies frames into the slots. Readers
+    never take a lock to read: each slot carries the id of the frame it holds,
+    and a reader re-checks that id after copying to detect being lapped.
+    """
+
+    def __init__(self, shape, size=RING_BUFFER_SIZE, dtype=np.uint8):
+        self.size = size
+        self.shape = tuple(shape)
+        self._frames = np.empty((size,) + self.shape, dtype=dtype)
+        self._frame_ids = np.full(size, -1, dtype=np.int64)
+        self._timestamps = np.zeros(size, dtype=np.float64)
+        self._latest_id = -1
+        self._cond = threading.Condition()
+
+    @property
+    def latest_id(self):
+        return self._latest_id
+
+    def publish(self, frame, timestamp):
+        """Copy a frame into the next slot and wake up waiting readers."""
+        frame_id = self._latest_id + 1
+        slot = frame_id % self.size
+
+        # Invalidate the slot while it is being overwritten
+        self._frame_ids[slot] = -1
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+        np.copyto(self._frames[slot], frame)
+        self._timestamps[slot] = timestamp
+        self._frame_ids[slot] = frame_id
+
+        with self._cond:
+            self._latest_id = frame_id
+            self._cond.notify_all()
+        return frame_id
+
+    def read(self, frame_id=None):
+        """Return (frame_id, timestamp, frame) or None if the frame was overwritten."""
+        if frame_id is None:
+            frame_id = self._latest_id
+        if frame_id < 0:
+            return None
+
+        slot = frame_id % self.size
+        if self._frame_ids[slot] != frame_id:
+            return None
+        timestamp = float(self._timestamps[slot])
+        frame = self._frames[slot].copy()
+
+        # The writer may have lapped us while we were copying
+        if self._frame_ids[slot] != frame_id:
+            return None
+        return frame_id, timestamp, frame
+
+    def wait_for_frame(self, after_id=-1, timeout=None):
+        """Block until a frame newer than after_id is available and return the latest one."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latest_id > after_id, timeout):
+                return None
+        return self.read()
+
+
+class CaptureThread(threading.Thread):
+    """Owns the VideoCapture and publishes every frame into a FrameRingBuffer."""
+
+    def __init__(self, camera, frame_shape, buffer_size=RING_BUFFER_SIZE):
+        super().__init__(name="camera-capture", daemon=True)
+        self.camera = camera
+        self.buffer = FrameRingBuffer(frame_shape, size=buffer_size)
+        self.fps = 0.0
+        self.max_consecutive_errors = 5
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        consecutive_errors = 0
+        last_frame_time = None
+        grab_seconds = metrics.stage('capture', 'grab')
+        publish_seconds = metrics.stage('capture', 'publish')
+        read_errors = metrics.counter('pose_capture_read_errors_total', 'Failed camera reads')
+
+        try:
+            while not self._stop_event.is_set():
+                started = time.perf_counter()
+                success, frame = self.camera.read()
+                grab_seconds.observe(time.perf_counter() - started)
+                timestamp = time.time()
+
+                if not success or frame is None:
+                    read_errors.inc()
+                    consecutive_errors += 1
+                    logger.warning("Failed to read frame from camera")
+                    if consecutive_errors >= self.max_consecutive_errors:
+                        logger.error("Too many consecutive frame read errors, stopping capture")
+                        break
+                    time.sleep(0.1)  # Short delay before retrying
+                    continue
+                consecutive_errors = 0
+
+                with publish_seconds.time():
+                    self.buffer.publish(frame, timestamp)
+
+                # Exponential moving average of the capture rate
+                if last_frame_time is not None and timestamp > last_frame_time:
+                    instant_fps = 1.0 / (timestamp - last_frame_time)
+                    self.fps = instant_fps if self.fps == 0 else 0.9 * self.fps + 0.1 * instant_fps
+                last_frame_time = timestamp
+        except Exception as e:
+            logger.error(f"Error in capture thread: {e}")
+        finally:
+            self.camera.release()
+            logger.info("Capture thread stopped")
+
+    def stats(self):
+        return {
+            'running': self.is_alive(),
+            'frame_id': self.buffer.latest_id,
+            'fps': round(self.fps, 1)
+        }
+
+
+# The single capture thread shared by the stream and every exercise
+_capture = None
+_capture_lock = threading.Lock()
+
+
+def open_camera():
+    """Open the first working camera and return (camera, first_frame)."""
+    for i in range(0, 4):  # Try up to 4 camera indices
+        camera = None
+        try:
+            if platform.system() == 'Darwin':
+                camera = cv2.VideoCapture(i, cv2.CAP_AVFOUNDATION)
+            else:
+                camera = cv2.VideoCapture(i)
+
+            if camera.isOpened():
+                # Set camera properties
+                camera.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+                camera.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+                camera.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
+
+                # Test camera by reading a frame
+                ret, frame = camera.read()
+                if ret and frame is not None:
+                    logger.info(f"Successfully initialized camera at index {i}")
+                    return camera, frame
+            camera.release()
+        except Exception as e:
+            logger.warning(f"Failed to initialize camera at index {i}: {e}")
+            if camera:
+                camera.release()
+
+    logger.error("Could not initialize any camera")
+    return None, None
+
+
+def start_capture():
+    """Start the shared capture thread if it is not running and return it."""
+    global _capture
+
+    with _capture_lock:
+        if _capture is not None and _capture.is_alive():
+            return _capture
+
+        camera, frame = open_camera()
+        if camera is None:
+            _capture = None
+            return None
+
+        _capture = CaptureThread(camera, frame.shape)
+        _capture.buffer.publish(frame, time.time())
+        _capture.start()
+        return _capture
+
+
+def get_frame_buffer():
+    """Get the shared frame buffer, starting the capture thread if necessary."""
+    capture = start_capture()
+    if capture is None:
+        raise Exception("Camera not available")
+    return capture.buffer
+
+
+def stop_capture():
+    """Stop the capture thread and release the camera."""
+    global _capture
+
+    with _capture_lock:
+        if _capture is not None:
+            _capture.stop()
+            _capture.join(timeout=2)
+            _capture = None
+
+
+def capture_stats():
+    """Report the state of the capture thread."""
+    capture = _capture
+    if capture is None:
+        return {'running': False, 'frame_id': -1, 'fps': 0.0}
+    return capture.stats()
+
+
+metrics.collect('pose_capture_fps', 'Frames per second delivered by the camera',
+                lambda: capture_stats()['fps'])
+metrics.collect('pose_capture_frames_total', 'Frames published by the capture thread',
+                lambda: capture_stats()['frame_id'] + 1, kind='counter')
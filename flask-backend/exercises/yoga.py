@@ -1,20 +1,23 @@
-import cv2
-import math
-import mediapipe as md
-import time
 import logging
+from sources import open_live_source
+from geometry import (
+    pose_features, joint_angles, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP,
+    LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Importing necessary libraries
-md_drawing = md.solutions.drawing_utils
-md_drawing_style = md.solutions.drawing_styles
-md_pose = md.solutions.pose
+
+# Knee angles measured ankle -> knee -> hip, as the pose checks expect
+LEG_ANGLES = {
+    'left_leg': (LEFT_ANKLE, LEFT_KNEE, LEFT_HIP),
+    'right_leg': (RIGHT_ANKLE, RIGHT_KNEE, RIGHT_HIP),
+}
 
 def detect_pose(landmarks, pose_name):
-    """Detect specific yoga poses based on body angles."""
+    """Detect specific yoga poses from a (33, 4) landmark array."""
     if pose_name == "tree":
         return detect_tree_pose(landmarks)
     elif pose_name == "warrior":
@@ -27,30 +30,8 @@ def detect_pose(landmarks, pose_name):
 def detect_tree_pose(landmarks):
     """Detect Tree Pose (Vrikshasana)."""
     try:
-        # Get relevant landmarks
-        left_hip = landmarks[md_pose.PoseLandmark.LEFT_HIP]
-        right_hip = landmarks[md_pose.PoseLandmark.RIGHT_HIP]
-        left_knee = landmarks[md_pose.PoseLandmark.LEFT_KNEE]
-        right_knee = landmarks[md_pose.PoseLandmark.RIGHT_KNEE]
-        left_ankle = landmarks[md_pose.PoseLandmark.LEFT_ANKLE]
-        right_ankle = landmarks[md_pose.PoseLandmark.RIGHT_ANKLE]
-        
-        # Calculate angles
-        left_leg_angle = math.degrees(math.atan2(
-            left_ankle.y - left_knee.y,
-            left_ankle.x - left_knee.x
-        ) - math.atan2(
-            left_hip.y - left_knee.y,
-            left_hip.x - left_knee.x
-        ))
-        
-        right_leg_angle = math.degrees(math.atan2(
-            right_ankle.y - right_knee.y,
-            right_ankle.x - right_knee.x
-        ) - math.atan2(
-            right_hip.y - right_knee.y,
-            right_hip.x - right_knee.x
-        ))
+        # Signed leg angles at both knees
+        left_leg_angle, right_leg_angle = joint_angles(landmarks, LEG_ANGLES, signed=True)
         
         # Check if one leg is straight and the other is bent
         if (left_leg_angle > 160 and right_leg_angle < 120) or (right_leg_angle > 160 and left_leg_angle < 120):
@@ -70,24 +51,8 @@ def detect_tree_pose(landmarks):
 def detect_warrior_pose(landmarks):
     """Detect Warrior II Pose (Virabhadrasana II)."""
     try:
-        # Get relevant landmarks
-        left_hip = landmarks[md_pose.PoseLandmark.LEFT_HIP]
-        right_hip = landmarks[md_pose.PoseLandmark.RIGHT_HIP]
-        left_knee = landmarks[md_pose.PoseLandmark.LEFT_KNEE]
-        right_knee = landmarks[md_pose.PoseLandmark.RIGHT_KNEE]
-        left_ankle = landmarks[md_pose.PoseLandmark.LEFT_ANKLE]
-        right_ankle = landmarks[md_pose.PoseLandmark.RIGHT_ANKLE]
-        left_shoulder = landmarks[md_pose.PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks[md_pose.PoseLandmark.RIGHT_SHOULDER]
-        
-        # Calculate angles
-        front_knee_angle = math.degrees(math.atan2(
-            left_ankle.y - left_knee.y,
-            left_ankle.x - left_knee.x
-        ) - math.atan2(
-            left_hip.y - left_knee.y,
-            left_hip.x - left_knee.x
-        ))
+        # Signed angle at the front (left) knee
+        front_knee_angle = joint_angles(landmarks, LEG_ANGLES, signed=True)[0]
         
         # Check if front knee is bent at 90 degrees and arms are extended
         if 80 < front_knee_angle < 100:
@@ -107,22 +72,10 @@ def detect_warrior_pose(landmarks):
 def detect_downward_dog(landmarks):
     """Detect Downward-Facing Dog Pose (Adho Mukha Svanasana)."""
     try:
-        # Get relevant landmarks
-        left_shoulder = landmarks[md_pose.PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks[md_pose.PoseLandmark.RIGHT_SHOULDER]
-        left_hip = landmarks[md_pose.PoseLandmark.LEFT_HIP]
-        right_hip = landmarks[md_pose.PoseLandmark.RIGHT_HIP]
-        left_knee = landmarks[md_pose.PoseLandmark.LEFT_KNEE]
-        right_knee = landmarks[md_pose.PoseLandmark.RIGHT_KNEE]
-        
-        # Calculate angles
-        hip_angle = math.degrees(math.atan2(
-            left_hip.y - right_hip.y,
-            left_hip.x - right_hip.x
-        ))
+        y = landmarks[:, 1]
         
         # Check if hips are higher than shoulders and legs are straight
-        if left_hip.y < left_shoulder.y and right_hip.y < right_shoulder.y:
+        if y[LEFT_HIP] < y[LEFT_SHOULDER] and y[RIGHT_HIP] < y[RIGHT_SHOULDER]:
             return {
                 "is_correct": True,
                 "feedback": "Good Downward Dog! Keep your spine straight"
@@ -136,101 +89,57 @@ def detect_downward_dog(landmarks):
         logger.error(f"Error in downward dog detection: {str(e)}")
         return {"is_correct": False, "feedback": "Error detecting pose"}
 
-def count_exercise():
-    """Main function to detect and count yoga poses."""
+def count_exercise(update_callback=None, source=None, timeout=60, max_count=30):
+    """Main function to detect and count yoga poses.
+
+    The hold is timed until max_count seconds (None for no cap) or timeout seconds
+    of source time (None for all of it).
+    """
     count = 0
-    start_time = time.time()
-    timeout = 60  # 60 seconds timeout
     last_feedback = "Get ready for yoga poses!"
     form_status = "good"
+    target_duration = 30  # 30 seconds target
     current_pose = None
-    pose_hold_time = 0
-    required_hold_time = 3  # seconds
 
-    # Try different camera indices
-    cap = None
-    for camera_index in [0, 1]:
+    # Read landmarks from the live pose stage unless a recorded source is given
+    if source is None:
         try:
-            cap = cv2.VideoCapture(camera_index)
-            if cap.isOpened():
-                ret, test_frame = cap.read()
-                if ret and test_frame is not None:
-                    logger.info(f"Successfully opened camera at index {camera_index}")
-                    break
-                else:
-                    cap.release()
-                    cap = None
-        except Exception as e:
-            logger.warning(f"Failed to open camera at index {camera_index}: {e}")
-            if cap:
-                cap.release()
-                cap = None
-
-    if not cap:
-        return {"count": 0, "feedback": "Could not open any camera"}
-
-    # Initialize pose detection with balanced confidence thresholds
-    pose = md_pose.Pose(
-        min_detection_confidence=0.6,
-        min_tracking_confidence=0.6,
-        model_complexity=1
-    )
+            source = open_live_source()
+        except Exception:
+            return {"count": 0, "feedback": "Could not access camera"}
+    start_time = source.clock()
 
     try:
         consecutive_failures = 0
-        last_valid_pose_time = time.time()
-        min_time_between_reps = 0.8  # Increased minimum time between reps
-        last_position_time = time.time()
+        last_progress = None
+        last_position_time = source.clock()
         position_hold_time = 0.3  # Time required to hold a position
         current_pose = None
         pose_start_time = None
-        max_pose_duration = 30  # Maximum pose duration in seconds
 
-        while time.time() - start_time < timeout:
-            success, image = cap.read()
-            if not success:
+        while timeout is None or source.clock() - start_time < timeout:
+            # Wait for landmarks of the next frame
+            record = source.next_record(timeout=1.0)
+            if record is None:
+                if source.finished:
+                    break
                 consecutive_failures += 1
                 if consecutive_failures > 5:
                     return {"count": count, "feedback": "Failed to read from camera consistently"}
                 continue
             consecutive_failures = 0
 
-            # Process frame
-            image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-            result = pose.process(image)
-            image.flags.writeable = True
+            if record.landmarks is not None:
+                # Joint angles, heights and distances in one vectorized pass
+                features = pose_features(record.landmarks)
+                back_angle = features['back_angle']
 
-            if result.pose_landmarks:
-                landmarks = result.pose_landmarks.landmark
-                
-                # Get key landmarks for yoga poses
-                left_shoulder = landmarks[md_pose.PoseLandmark.LEFT_SHOULDER]
-                right_shoulder = landmarks[md_pose.PoseLandmark.RIGHT_SHOULDER]
-                left_hip = landmarks[md_pose.PoseLandmark.LEFT_HIP]
-                right_hip = landmarks[md_pose.PoseLandmark.RIGHT_HIP]
-                left_knee = landmarks[md_pose.PoseLandmark.LEFT_KNEE]
-                right_knee = landmarks[md_pose.PoseLandmark.RIGHT_KNEE]
-                left_ankle = landmarks[md_pose.PoseLandmark.LEFT_ANKLE]
-                right_ankle = landmarks[md_pose.PoseLandmark.RIGHT_ANKLE]
-                left_elbow = landmarks[md_pose.PoseLandmark.LEFT_ELBOW]
-                right_elbow = landmarks[md_pose.PoseLandmark.RIGHT_ELBOW]
-                left_wrist = landmarks[md_pose.PoseLandmark.LEFT_WRIST]
-                right_wrist = landmarks[md_pose.PoseLandmark.RIGHT_WRIST]
-                
-                # Calculate angles with smoothing
-                back_angle = abs(math.degrees(math.atan2(
-                    (right_shoulder.y + left_shoulder.y) / 2 - (right_hip.y + left_hip.y) / 2,
-                    (right_shoulder.x + left_shoulder.x) / 2 - (right_hip.x + left_hip.x) / 2
-                )))
-                
-                # Calculate relative heights
-                shoulder_height = (left_shoulder.y + right_shoulder.y) / 2
-                hip_height = (left_hip.y + right_hip.y) / 2
-                knee_height = (left_knee.y + right_knee.y) / 2
-                ankle_height = (left_ankle.y + right_ankle.y) / 2
+                # Relative heights
+                shoulder_height = features['shoulder_height']
+                hip_height = features['hip_height']
+                knee_height = features['knee_height']
 
-                current_time = time.time()
+                current_time = record.timestamp
 
                 # More forgiving yoga pose detection with hold time requirement
                 if (back_angle < 15 and  # More forgiving back angle
@@ -243,7 +152,6 @@ def count_exercise():
                                 pose_start_time = current_time
                             last_feedback = "Good form! Hold the pose"
                             form_status = "good"
-                            last_valid_pose_time = current_time
                     last_position_time = current_time
                 else:
                     last_position_time = current_time  # Reset hold time
@@ -264,18 +172,25 @@ def count_exercise():
                 # Update count based on duration
                 if current_pose == "yoga" and pose_start_time is not None:
                     elapsed_time = current_time - pose_start_time
-                    if elapsed_time >= max_pose_duration:
-                        count = max_pose_duration
+                    if max_count is not None and elapsed_time >= max_count:
+                        count = max_count
                         return {"count": count, "feedback": "Great job! You've completed your yoga pose!"}
                     else:
                         count = int(elapsed_time)
-                        last_feedback = f"Hold for {max_pose_duration - count} more seconds"
+                        remaining_time = target_duration - count
+                        if remaining_time > 0:
+                            last_feedback = f"Hold for {remaining_time} more seconds"
+                        else:
+                            last_feedback = "Excellent! Keep holding for extra credit!"
             else:
                 last_feedback = "Cannot detect body position. Please ensure you're visible in the camera"
                 form_status = "warning"
 
-            # Add a small delay to prevent high CPU usage
-            time.sleep(0.1)
+            # Report progress whenever the count, feedback or form changes
+            progress = (count, last_feedback, form_status)
+            if update_callback and progress != last_progress:
+                update_callback(*progress)
+                last_progress = progress
 
         # If we hit the timeout
         if count > 0:
@@ -287,6 +202,4 @@ def count_exercise():
         logger.error(f"Error during yoga pose detection: {str(e)}")
         return {"count": count, "feedback": f"Error: {str(e)}"}
     finally:
-        if cap:
-            cap.release()
-        cv2.destroyAllWindows() 
\ No newline at end of file
+        source.close() 
\ No newline at end of file
@@ -1,95 +1,51 @@
-import cv2
-import math
-import mediapipe as md
-import time
 import logging
+from sources import open_live_source
+from geometry import pose_features
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Importing necessary libraries
-md_drawing = md.solutions.drawing_utils
-md_drawing_style = md.solutions.drawing_styles
-md_pose = md.solutions.pose
 
-def count_exercise():
-    start_time = time.time()
+def count_exercise(update_callback=None, source=None, timeout=60, max_count=30):
+    """Time the pose until it is held max_count seconds or timeout seconds of source time pass; None lifts either limit."""
     pose_start_time = None
     total_pose_time = 0
     last_feedback = "Get ready for the yoga pose!"
     form_status = "good"  # Can be "good", "warning", or "bad"
     target_duration = 30  # 30 seconds target
 
-    # Try different camera indices
-    cap = None
-    for camera_index in [0, 1]:
+    # Read landmarks from the live pose stage unless a recorded source is given
+    if source is None:
         try:
-            cap = cv2.VideoCapture(camera_index)
-            if cap.isOpened():
-                ret, test_frame = cap.read()
-                if ret and test_frame is not None:
-                    logger.info(f"Successfully opened camera at index {camera_index}")
-                    break
-                else:
-                    cap.release()
-                    cap = None
-        except Exception as e:
-            logger.warning(f"Failed to open camera at index {camera_index}: {e}")
-            if cap:
-                cap.release()
-                cap = None
-
-    if not cap:
-        return {"count": 0, "feedback": "Could not open any camera"}
-
-    # Initialize pose detection with higher confidence thresholds
-    pose = md_pose.Pose(
-        min_detection_confidence=0.7,
-        min_tracking_confidence=0.8,
-        model_complexity=1
-    )
+            source = open_live_source()
+        except Exception:
+            return {"count": 0, "feedback": "Could not access camera"}
+    start_time = source.clock()
 
     try:
         consecutive_failures = 0
-        while time.time() - start_time < 60:  # 60 seconds timeout
-            success, image = cap.read()
-            if not success:
+        last_progress = None
+        while timeout is None or source.clock() - start_time < timeout:
+            # Wait for landmarks of the next frame
+            record = source.next_record(timeout=1.0)
+            if record is None:
+                if source.finished:
+                    break
                 consecutive_failures += 1
                 if consecutive_failures > 5:
                     return {"count": total_pose_time, "feedback": "Failed to read from camera consistently"}
                 continue
             consecutive_failures = 0
 
-            # Process frame
-            image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-            result = pose.process(image)
-            image.flags.writeable = True
+            if record.landmarks is not None:
+                # Joint angles, heights and distances in one vectorized pass
+                features = pose_features(record.landmarks)
+
+                # Shoulder and hip tilt for pose detection
+                shoulder_angle = features['shoulder_tilt']
+                hip_angle = features['hip_tilt']
 
-            if result.pose_landmarks:
-                landmarks = result.pose_landmarks.landmark
-                
-                # Get key landmarks for pose detection
-                left_shoulder = landmarks[md_pose.PoseLandmark.LEFT_SHOULDER]
-                right_shoulder = landmarks[md_pose.PoseLandmark.RIGHT_SHOULDER]
-                left_hip = landmarks[md_pose.PoseLandmark.LEFT_HIP]
-                right_hip = landmarks[md_pose.PoseLandmark.RIGHT_HIP]
-                left_knee = landmarks[md_pose.PoseLandmark.LEFT_KNEE]
-                right_knee = landmarks[md_pose.PoseLandmark.RIGHT_KNEE]
-                left_ankle = landmarks[md_pose.PoseLandmark.LEFT_ANKLE]
-                right_ankle = landmarks[md_pose.PoseLandmark.RIGHT_ANKLE]
-                
-                # Calculate angles for pose detection
-                shoulder_angle = math.degrees(math.atan2(
-                    right_shoulder.y - left_shoulder.y,
-                    right_shoulder.x - left_shoulder.x
-                ))
-                hip_angle = math.degrees(math.atan2(
-                    right_hip.y - left_hip.y,
-                    right_hip.x - left_hip.x
-                ))
-                
                 # Check form and provide feedback
                 if abs(shoulder_angle) > 10 or abs(hip_angle) > 10:
                     form_status = "warning"
@@ -97,10 +53,10 @@ def count_exercise():
                 else:
                     form_status = "good"
                     if pose_start_time is None:
-                        pose_start_time = time.time()
+                        pose_start_time = record.timestamp
                         last_feedback = "Good form! Hold the pose"
                     else:
-                        current_pose_time = time.time() - pose_start_time
+                        current_pose_time = record.timestamp - pose_start_time
                         if current_pose_time > 1:  # Only count after 1 second of good form
                             total_pose_time = int(current_pose_time)
                             remaining_time = max(0, target_duration - total_pose_time)
@@ -113,12 +69,15 @@ def count_exercise():
                 last_feedback = "Cannot detect body position. Please ensure you're visible in the camera"
                 pose_start_time = None
 
-            # Check if target duration is reached
-            if total_pose_time >= target_duration:
+            # Check if the longest hold is reached
+            if max_count is not None and total_pose_time >= max_count:
                 return {"count": total_pose_time, "feedback": "Great job! You've completed the pose!"}
 
-            # Add a small delay to prevent high CPU usage
-            time.sleep(0.1)
+            # Report progress whenever the count, feedback or form changes
+            progress = (total_pose_time, last_feedback, form_status)
+            if update_callback and progress != last_progress:
+                update_callback(*progress)
+                last_progress = progress
 
         # If we hit the timeout
         if total_pose_time > 0:
@@ -130,6 +89,4 @@ def count_exercise():
         logger.error(f"Error during pose detection: {str(e)}")
         return {"count": total_pose_time, "feedback": f"Error: {str(e)}"}
     finally:
-        if cap:
-            cap.release()
-        cv2.destroyAllWindows() 
\ No newline at end of file
+        source.close() 
\ No newline at end of file
@@ -0,0 +1,104 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import mediapipe as mp
+from landmark_cache import NUM_LANDMARKS, cache_key, cache_paths, write_cache
+from pose_stage import POSE_OPTIONS
+from score_videos import find_clips
+from sources import VideoFileSource
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+mp_pose = mp.solutions.pose
+
+# One pose model per worker process, created by the pool initializer
+_worker_pose = None
+_worker_options = None
+
+
+def init_worker(pose_options):
+    """Build the worker's pose model once and reuse it for every clip."""
+    global _worker_pose, _worker_options
+    _worker_options = pose_options
+    _worker_pose = mp_pose.Pose(**pose_options)
+
+
+def extract_clip(path, cache_dir, force=False):
+    """Run pose extraction over one clip and write it to the cache."""
+    started = time.time()
+    key = cache_key(path, _worker_options)
+    if not force and all(os.path.exists(p) for p in cache_paths(cache_dir, key)):
+        return {'clip': path, 'key': key, 'cached': True}
+
+    # Tracking state must not leak from the previous clip
+    if hasattr(_worker_pose, 'reset'):
+        _worker_pose.reset()
+
+    source = VideoFileSource(path, pose=_worker_pose)
+    landmarks = []
+    timestamps = []
+    missing = np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    try:
+        while True:
+            record = source.next_record()
+            if record is None:
+                break
+            landmarks.append(record.landmarks if record.landmarks is not None else missing)
+            timestamps.append(record.timestamp)
+    finally:
+        source.close()
+
+    stacked = np.stack(landmarks) if landmarks else np.empty((0, NUM_LANDMARKS, 4), dtype=np.float32)
+    write_cache(cache_dir, key, stacked, timestamps)
+    return {
+        'clip': path,
+        'key': key,
+        'cached': False,
+        'frames': len(timestamps),
+        'seconds': round(time.time() - started, 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract pose landmarks from videos into an on-disk cache.")
+    parser.add_argument('paths', nargs='+', help="Video files or directories of clips")
+    parser.add_argument('--cache-dir', default='landmark_cache')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--model-complexity', type=int, choices=[0, 1, 2],
+                        default=POSE_OPTIONS['model_complexity'])
+    parser.add_argument('--force', action='store_true', help="Re-extract clips that are already cached")
+    args = parser.parse_args(argv)
+
+    clips = find_clips(args.paths)
+    if not clips:
+        logger.error("No video clips found")
+        return 1
+
+    pose_options = dict(POSE_OPTIONS, model_complexity=args.model_complexity)
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(pose_options,)) as pool:
+        futures = {pool.submit(extract_clip, path, args.cache_dir, args.force): path for path in clips}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failures += 1
+                logger.error(f"Failed to extract {path}: {e}")
+                continue
+            if result['cached']:
+                logger.info(f"{path}: already cached as {result['key']}")
+            else:
+                logger.info(f"{path}: {result['frames']} frames in {result['seconds']}s")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
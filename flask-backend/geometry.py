@@ -0,0 +1,120 @@
+import numpy as np
+
+# Landmark indices, same numbering as mp.solutions.pose.PoseLandmark
+NOSE = 0
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_ELBOW = 13
+RIGHT_ELBOW = 14
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_HIP = 23
+RIGHT_HIP = 24
+LEFT_KNEE = 25
+RIGHT_KNEE = 26
+LEFT_ANKLE = 27
+RIGHT_ANKLE = 28
+
+# Joint angles measured at the middle landmark of each (first, vertex, second) triple
+JOINT_ANGLES = {
+    'left_elbow': (LEFT_WRIST, LEFT_ELBOW, LEFT_SHOULDER),
+    'right_elbow': (RIGHT_WRIST, RIGHT_ELBOW, RIGHT_SHOULDER),
+    'left_knee': (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    'right_knee': (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+}
+
+# Left/right landmark pairs used for midpoints and distances
+LANDMARK_PAIRS = {
+    'shoulder': (LEFT_SHOULDER, RIGHT_SHOULDER),
+    'wrist': (LEFT_WRIST, RIGHT_WRIST),
+    'hip': (LEFT_HIP, RIGHT_HIP),
+    'knee': (LEFT_KNEE, RIGHT_KNEE),
+    'ankle': (LEFT_ANKLE, RIGHT_ANKLE),
+}
+
+SHOULDER_PAIR = list(LANDMARK_PAIRS).index('shoulder')
+HIP_PAIR = list(LANDMARK_PAIRS).index('hip')
+
+
+def _as_index(table):
+    """Turn a {name: landmark indices} table into an integer index array."""
+    if isinstance(table, np.ndarray):
+        return table
+    return np.array(list(table.values()))
+
+
+# Precomputed index arrays for the default tables
+JOINT_INDEX = _as_index(JOINT_ANGLES)
+PAIR_INDEX = _as_index(LANDMARK_PAIRS)
+
+
+def landmarks_to_array(pose_landmarks):
+    """Convert a NormalizedLandmarkList into a (33, 4) float32 array of x, y, z, visibility."""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+        dtype=np.float32
+    )
+
+
+def joint_angles(landmarks, joints=JOINT_INDEX, signed=False):
+    """Angles in degrees at each joint vertex for (..., 33, 4) landmarks -> (..., J).
+
+    Uses the same atan2 difference as the original per-module code, so the
+    thresholds in the counters keep their meaning.
+    """
+    triples = _as_index(joints)
+    xy = landmarks[..., :2]
+    first = xy[..., triples[:, 0], :] - xy[..., triples[:, 1], :]
+    second = xy[..., triples[:, 2], :] - xy[..., triples[:, 1], :]
+    angles = np.degrees(
+        np.arctan2(first[..., 1], first[..., 0]) - np.arctan2(second[..., 1], second[..., 0])
+    )
+    return angles if signed else np.abs(angles)
+
+
+def segment_angles(start, end):
+    """Signed angle in degrees of the segment start -> end for (..., 2) points."""
+    delta = end - start
+    return np.degrees(np.arctan2(delta[..., 1], delta[..., 0]))
+
+
+def midpoints(landmarks, pairs=PAIR_INDEX):
+    """Midpoint of each landmark pair for (..., 33, 4) landmarks -> (..., P, 2)."""
+    index = _as_index(pairs)
+    xy = landmarks[..., :2]
+    return (xy[..., index[:, 0], :] + xy[..., index[:, 1], :]) / 2
+
+
+def distances(landmarks, pairs=PAIR_INDEX):
+    """2D distance between each landmark pair for (..., 33, 4) landmarks -> (..., P)."""
+    index = _as_index(pairs)
+    xy = landmarks[..., :2]
+    return np.linalg.norm(xy[..., index[:, 1], :] - xy[..., index[:, 0], :], axis=-1)
+
+
+def pose_features(landmarks):
+    """Every angle, height and distance the counters use, computed in one pass.
+
+    Accepts a single (33, 4) pose or a batch of shape (N, 33, 4); each value in
+    the returned dict has the leading batch shape.
+    """
+    features = {}
+
+    angles = joint_angles(landmarks)
+    for i, name in enumerate(JOINT_ANGLES):
+        features[f'{name}_angle'] = angles[..., i]
+
+    centers = midpoints(landmarks)
+    spans = distances(landmarks)
+    for i, name in enumerate(LANDMARK_PAIRS):
+        features[f'{name}_height'] = centers[..., i, 1]
+        features[f'{name}_distance'] = spans[..., i]
+
+    # Torso and left-to-right tilt angles
+    features['back_angle'] = np.abs(
+        segment_angles(centers[..., HIP_PAIR, :], centers[..., SHOULDER_PAIR, :])
+    )
+    xy = landmarks[..., :2]
+    features['shoulder_tilt'] = segment_angles(xy[..., LEFT_SHOULDER, :], xy[..., RIGHT_SHOULDER, :])
+    features['hip_tilt'] = segment_angles(xy[..., LEFT_HIP, :], xy[..., RIGHT_HIP, :])
+    return features
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import numpy as np
+import mediapipe as mp
+from pose_stage import LandmarkRecord
+
+# Bump when the on-disk layout changes so stale entries are ignored
+CACHE_FORMAT_VERSION = 1
+
+NUM_LANDMARKS = 33
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_hash(pose_options):
+    """Short hash of everything that changes the extracted landmarks."""
+    settings = {
+        'format': CACHE_FORMAT_VERSION,
+        'mediapipe': getattr(mp, '__version__', 'unknown'),
+        'pose': pose_options
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def cache_key(path, pose_options):
+    """Cache key for a clip: content hash plus model settings."""
+    return f"{file_hash(path)[:32]}-{settings_hash(pose_options)}"
+
+
+def cache_paths(cache_dir, key):
+    """Landmark and timestamp .npy files for a cache key."""
+    return (
+        os.path.join(cache_dir, f"{key}.landmarks.npy"),
+        os.path.join(cache_dir, f"{key}.timestamps.npy")
+    )
+
+
+def _save_atomic(path, array):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def write_cache(cache_dir, key, landmarks, timestamps):
+    """Store (N, 33, 4) float32 landmarks (NaN = no person) and (N,) timestamps."""
+    os.makedirs(cache_dir, exist_ok=True)
+    landmarks_path, timestamps_path = cache_paths(cache_dir, key)
+    # Timestamps go last, so a present timestamps file implies a complete entry
+    _save_atomic(landmarks_path, np.asarray(landmarks, dtype=np.float32))
+    _save_atomic(timestamps_path, np.asarray(timestamps, dtype=np.float64))
+
+
+def load_cache(cache_dir, key):
+    """Memory-map a cached clip, returning (landmarks, timestamps) or None."""
+    landmarks_path, timestamps_path = cache_paths(cache_dir, key)
+    if not (os.path.exists(landmarks_path) and os.path.exists(timestamps_path)):
+        return None
+    landmarks = np.load(landmarks_path, mmap_mode='r')
+    timestamps = np.load(timestamps_path, mmap_mode='r')
+    if landmarks.shape[1:] != (NUM_LANDMARKS, 4) or len(landmarks) != len(timestamps):
+        return None
+    return landmarks, timestamps
+
+
+class CachedLandmarkSource:
+    """Landmark source that replays a cached clip without running inference."""
+
+    def __init__(self, landmarks, timestamps, path=None):
+        self.path = path
+        self.finished = False
+        self.frames_read = 0
+        self._landmarks = landmarks
+        self._timestamps = timestamps
+        # Rows of NaN mark frames where nobody was detected
+        self._detected = ~np.isnan(landmarks[:, 0, 0])
+        self._clock = 0.0
+
+    def clock(self):
+        return self._clock
+
+    def next_record(self, timeout=None):
+        index = self.frames_read
+        if index >= len(self._timestamps):
+            self.finished = True
+            return None
+        self.frames_read += 1
+        self._clock = float(self._timestamps[index])
+        landmarks = self._landmarks[index] if self._detected[index] else None
+        return LandmarkRecord(index, self._clock, landmarks)
+
+    def close(self):
+        pass
+
+
+def open_cached_source(cache_dir, path, pose_options):
+    """Return a CachedLandmarkSource for a clip, or None if it is not cached."""
+    key = cache_key(path, pose_options)
+    cached = load_cache(cache_dir, key)
+    if cached is None:
+        return None
+    return CachedLandmarkSource(*cached, path=path)
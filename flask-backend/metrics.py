@@ -0,0 +1,264 @@
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds between metric snapshots written to the log; 0 disables them
+METRICS_LOG_INTERVAL = float(os.getenv('METRICS_LOG_INTERVAL', 0))
+
+# Upper bounds in seconds, growing by 1.5x from 0.1 ms to about 3.8 s. Fixed buckets keep
+# an observation to one bisect and two additions, so histograms can stay on in production.
+DEFAULT_BUCKETS = tuple(round(0.0001 * 1.5 ** i, 7) for i in range(27))
+
+# Latency of each step of the video pipeline, labelled by component and stage
+STAGE_SECONDS = 'pose_pipeline_stage_seconds'
+STAGE_SECONDS_HELP = 'Time spent in one step of the video pipeline'
+
+# Capture-to-consumer delay of the frames each consumer handles
+FRAME_AGE_SECONDS = 'pose_pipeline_frame_age_seconds'
+FRAME_AGE_SECONDS_HELP = 'Age of a frame when its consumer finished with it'
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed bucket bounds."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def time(self):
+        """Context manager observing the duration of its block."""
+        return _Timer(self)
+
+    def snapshot(self):
+        """Consistent copy of (bucket counts, count, sum, max)."""
+        with self._lock:
+            return list(self._counts), self._count, self._sum, self._max
+
+    def percentiles(self, quantiles=PERCENTILES):
+        """Estimate quantiles by interpolating inside the bucket each one falls in."""
+        counts, count, _, maximum = self.snapshot()
+        results = {}
+        for q in quantiles:
+            if count == 0:
+                results[q] = 0.0
+                continue
+            rank = q * count
+            seen = 0
+            for index, bucket_count in enumerate(counts):
+                if seen + bucket_count >= rank and bucket_count:
+                    lower = self.buckets[index - 1] if index > 0 else 0.0
+                    upper = self.buckets[index] if index < len(self.buckets) else maximum
+                    value = lower + (upper - lower) * (rank - seen) / bucket_count
+                    results[q] = min(value, maximum)
+                    break
+                seen += bucket_count
+        return results
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Counter:
+    """Monotonic counter."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """Named metric families, rendered in the Prometheus text format.
+
+    Hot paths look up their Histogram or Counter once and keep it; gauges are
+    collected from callables only when metrics are scraped or logged.
+    """
+
+    def __init__(self):
+        self._histograms = {}   # name -> (help, {labels: Histogram})
+        self._counters = {}     # name -> (help, {labels: Counter})
+        self._collectors = []   # (name, help, kind, fn)
+        self._lock = threading.Lock()
+
+    def _child(self, families, name, help, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, children = families.setdefault(name, (help, {}))
+            child = children.get(key)
+            if child is None:
+                child = children[key] = factory()
+            return child
+
+    def histogram(self, name, help='', **labels):
+        """The histogram for one label set, created on first use."""
+        return self._child(self._histograms, name, help, labels, Histogram)
+
+    def counter(self, name, help='', **labels):
+        """The counter for one label set, created on first use."""
+        return self._child(self._counters, name, help, labels, Counter)
+
+    def stage(self, component, stage):
+        """Latency histogram for one stage of a pipeline component."""
+        return self.histogram(STAGE_SECONDS, STAGE_SECONDS_HELP, component=component, stage=stage)
+
+    def frame_age(self, consumer):
+        """Capture-to-consumer latency histogram for one consumer."""
+        return self.histogram(FRAME_AGE_SECONDS, FRAME_AGE_SECONDS_HELP, consumer=consumer)
+
+    def collect(self, name, help, fn, kind='gauge'):
+        """Register fn, returning a number or a list of (labels, value), to be read at scrape time."""
+        with self._lock:
+            self._collectors.append((name, help, kind, fn))
+
+    def _collected(self):
+        for name, help, kind, fn in list(self._collectors):
+            try:
+                value = fn()
+            except Exception as e:
+                logger.warning(f"Metric collector {name} failed: {e}")
+                continue
+            samples = value if isinstance(value, list) else [({}, value)]
+            yield name, help, kind, samples
+
+    def percentiles(self, name=STAGE_SECONDS):
+        """p50/p95/p99 in milliseconds and sample count for every label set of a histogram."""
+        with self._lock:
+            children = dict(self._histograms.get(name, (None, {}))[1])
+        results = {}
+        for key, histogram in sorted(children.items()):
+            _, count, _, _ = histogram.snapshot()
+            if not count:
+                continue
+            label = '/'.join(value for _, value in key)
+            results[label] = {
+                f'p{round(q * 100)}': round(value * 1000, 2)
+                for q, value in histogram.percentiles().items()
+            }
+            results[label]['count'] = count
+        return results
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {name: (help, dict(children)) for name, (help, children) in self._histograms.items()}
+            counters = {name: (help, dict(children)) for name, (help, children) in self._counters.items()}
+
+        lines = []
+        for name, (help, children) in sorted(histograms.items()):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, histogram in sorted(children.items()):
+                counts, count, total, _ = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (math.inf,), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == math.inf else repr(bound)
+                    lines.append(f'{name}_bucket{_labels(key + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(key)} {total!r}')
+                lines.append(f'{name}_count{_labels(key)} {count}')
+
+        for name, (help, children) in sorted(counters.items()):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} counter')
+            for key, counter in sorted(children.items()):
+                lines.append(f'{name}{_labels(key)} {counter.value}')
+
+        for name, help, kind, samples in self._collected():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(tuple(sorted(labels.items())))} {float(value)!r}')
+
+        return '\n'.join(lines) + '\n'
+
+    def log_snapshot(self):
+        """Write stage percentiles and collected gauges to the log."""
+        for title, name in (('Pipeline latency', STAGE_SECONDS), ('Frame age', FRAME_AGE_SECONDS)):
+            summary = '; '.join(
+                f"{label} p50={p['p50']}ms p95={p['p95']}ms p99={p['p99']}ms n={p['count']}"
+                for label, p in self.percentiles(name).items()
+            )
+            logger.info(f"{title}: {summary or 'no samples yet'}")
+        for name, _, _, samples in self._collected():
+            values = ', '.join(
+                f"{'/'.join(str(v) for v in labels.values()) or 'value'}={value}"
+                for labels, value in samples
+            )
+            if values:
+                logger.info(f"{name}: {values}")
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in key) + '}'
+
+
+# The registry shared by every pipeline component in this process
+metrics = MetricsRegistry()
+
+_reporter = None
+_reporter_lock = threading.Lock()
+
+
+def start_log_reporter(interval=METRICS_LOG_INTERVAL):
+    """Log a metrics snapshot every interval seconds; does nothing if interval is 0."""
+    global _reporter
+
+    if interval <= 0:
+        return None
+    with _reporter_lock:
+        if _reporter is not None:
+            return _reporter
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    metrics.log_snapshot()
+                except Exception as e:
+                    logger.error(f"Error logging metrics: {e}")
+
+        _reporter = threading.Thread(target=run, name="metrics-log", daemon=True)
+        _reporter.start()
+        return _reporter
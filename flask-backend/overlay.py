@@ -0,0 +1,139 @@
+import cv2
+import threading
+from collections import OrderedDict
+import numpy as np
+import mediapipe as mp
+
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+mp_drawing_style = mp.solutions.drawing_styles
+
+# Landmarks below this visibility are not drawn, as in mp_drawing.draw_landmarks
+VISIBILITY_THRESHOLD = 0.5
+
+FEEDBACK_LINE_CHARS = 30
+
+# Rendered text blocks kept for reuse; the text on screen changes rarely
+TEXT_CACHE_SIZE = 64
+
+
+def wrap_feedback(text, max_chars=FEEDBACK_LINE_CHARS):
+    """Split feedback into lines of at most max_chars, breaking between words."""
+    lines = []
+    current_line = []
+    for word in text.split():
+        current_line.append(word)
+        if len(' '.join(current_line)) > max_chars:
+            lines.append(' '.join(current_line[:-1]))
+            current_line = [word]
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+class TextBlock:
+    """Pre-rendered lines of text that can be stamped onto frames."""
+
+    def __init__(self, lines, origin, scale, color, thickness=2, line_height=30,
+                 font=cv2.FONT_HERSHEY_SIMPLEX):
+        x, y = origin
+        sizes = [cv2.getTextSize(line, font, scale, thickness) for line in lines]
+        ascent = max(height for (_, height), _ in sizes) + thickness
+        descent = max(baseline for _, baseline in sizes) + thickness
+
+        # Bitmap covers every line; coordinates are relative to its top-left corner
+        self.left = max(0, x - thickness)
+        self.top = max(0, y - ascent)
+        width = max(w for (w, _), _ in sizes) + x - self.left + thickness
+        height = y + (len(lines) - 1) * line_height + descent - self.top
+        self.bitmap = np.zeros((height, width, 3), dtype=np.uint8)
+        for i, line in enumerate(lines):
+            cv2.putText(self.bitmap, line, (x - self.left, y - self.top + i * line_height),
+                        font, scale, color, thickness)
+        self.mask = self.bitmap.any(axis=2)
+
+    def draw(self, frame):
+        """Copy the text pixels onto frame, clipped to its bounds."""
+        height = min(self.bitmap.shape[0], frame.shape[0] - self.top)
+        width = min(self.bitmap.shape[1], frame.shape[1] - self.left)
+        if height <= 0 or width <= 0:
+            return
+        region = frame[self.top:self.top + height, self.left:self.left + width]
+        mask = self.mask[:height, :width]
+        region[mask] = self.bitmap[:height, :width][mask]
+
+
+class OverlayRenderer:
+    """Draws the pose skeleton, status, count and feedback onto stream frames.
+
+    Drawing styles and connection indices are resolved once, the skeleton is
+    drawn from vectorised point arrays, and text is rendered to bitmaps that
+    are only rebuilt when the text changes.
+    """
+
+    def __init__(self):
+        # Same look as draw_landmarks with the default pose style
+        landmark_style = mp_drawing_style.get_default_pose_landmarks_style()
+        specs = [landmark_style[landmark] for landmark in sorted(landmark_style, key=int)]
+        self.landmark_colors = [tuple(int(c) for c in spec.color) for spec in specs]
+        self.landmark_radius = [spec.circle_radius for spec in specs]
+        self.landmark_thickness = [spec.thickness for spec in specs]
+        self.border_radius = [max(r + 1, int(r * 1.2)) for r in self.landmark_radius]
+        self.border_color = mp_drawing.WHITE_COLOR
+
+        connection_spec = mp_drawing.DrawingSpec()
+        self.connection_color = connection_spec.color
+        self.connection_thickness = connection_spec.thickness
+        self.connections = np.array(sorted(mp_pose.POSE_CONNECTIONS), dtype=np.intp)
+
+        self._text_blocks = OrderedDict()
+        self._text_lock = threading.Lock()
+
+    def text_block(self, text, origin, scale, color, wrap=False):
+        """Cached TextBlock for this text and style; wrapping only happens on a miss."""
+        key = (text, origin, scale, color, wrap)
+        with self._text_lock:
+            block = self._text_blocks.get(key)
+            if block is not None:
+                self._text_blocks.move_to_end(key)
+                return block
+        block = TextBlock((wrap_feedback(text) if wrap else None) or [text], origin, scale, color)
+        with self._text_lock:
+            self._text_blocks[key] = block
+            while len(self._text_blocks) > TEXT_CACHE_SIZE:
+                self._text_blocks.popitem(last=False)
+        return block
+
+    def draw_landmarks(self, frame, landmarks):
+        """Draw the skeleton for a (33, 4) normalised landmark array."""
+        height, width = frame.shape[:2]
+        x, y, visibility = landmarks[:, 0], landmarks[:, 1], landmarks[:, 3]
+        visible = ((visibility >= VISIBILITY_THRESHOLD)
+                   & (x >= 0) & (x <= 1) & (y >= 0) & (y <= 1))
+        points = np.empty((len(landmarks), 2), dtype=np.int32)
+        points[:, 0] = np.minimum(np.floor(x * width), width - 1)
+        points[:, 1] = np.minimum(np.floor(y * height), height - 1)
+
+        # All bones whose two ends are visible, in one call
+        bones = self.connections[visible[self.connections].all(axis=1)]
+        if len(bones):
+            cv2.polylines(frame, list(points[bones]), False,
+                          self.connection_color, self.connection_thickness)
+
+        for index in np.flatnonzero(visible):
+            center = (int(points[index, 0]), int(points[index, 1]))
+            thickness = self.landmark_thickness[index]
+            cv2.circle(frame, center, self.border_radius[index], self.border_color, thickness)
+            cv2.circle(frame, center, self.landmark_radius[index], self.landmark_colors[index], thickness)
+
+    def draw(self, frame, landmarks, count=0, feedback=""):
+        """Draw landmarks (or None), the person status, rep count and feedback onto frame."""
+        if landmarks is not None:
+            self.draw_landmarks(frame, landmarks)
+            self.text_block("Person Detected", (10, 30), 1, (0, 255, 0)).draw(frame)
+        else:
+            self.text_block("No Person Detected", (10, 30), 1, (0, 0, 255)).draw(frame)
+
+        self.text_block(f'Count: {count}', (10, 70), 1, (0, 255, 0)).draw(frame)
+        if feedback:
+            self.text_block(feedback, (10, 100), 0.7, (0, 255, 0), wrap=True).draw(frame)
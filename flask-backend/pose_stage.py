@@ -0,0 +1,211 @@
+import cv2
+import logging
+import os
+import threading
+import time
+from collections import deque
+import mediapipe as mp
+from capture import get_frame_buffer
+from geometry import landmarks_to_array
+from metrics import metrics
+from scheduler import FrameScheduler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+mp_pose = mp.solutions.pose
+
+# Number of landmark records kept for late subscribers
+RECORD_HISTORY = 8
+
+# Settings for the single shared pose model
+POSE_OPTIONS = {
+    'min_detection_confidence': 0.6,
+    'min_tracking_confidence': 0.6,
+    'model_complexity': 1
+}
+
+# Width of the copy pose inference runs on; 0 keeps the full camera resolution.
+# Landmarks are normalised, so they line up with the display frame either way.
+POSE_INPUT_WIDTH = int(os.getenv('POSE_INPUT_WIDTH', 640))
+
+
+# Latency of each step of live inference
+STAGE_TIMINGS = {stage: metrics.stage('pose', stage) for stage in ('resize', 'flip', 'cvtcolor', 'process')}
+
+
+def inference_input(frame, width=POSE_INPUT_WIDTH):
+    """Downscale a BGR frame for inference and convert it to mirrored RGB."""
+    height, frame_width = frame.shape[:2]
+    if width and frame_width > width:
+        with STAGE_TIMINGS['resize'].time():
+            frame = cv2.resize(frame, (width, round(height * width / frame_width)),
+                               interpolation=cv2.INTER_AREA)
+    # Same selfie-view orientation the overlay and counters expect
+    with STAGE_TIMINGS['flip'].time():
+        frame = cv2.flip(frame, 1)
+    with STAGE_TIMINGS['cvtcolor'].time():
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+class LandmarkRecord:
+    """Pose landmarks for one captured frame, shared read-only by every consumer."""
+
+    __slots__ = ('frame_id', 'timestamp', 'landmarks')
+
+    def __init__(self, frame_id, timestamp, landmarks):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        # (33, 4) float32 array of x, y, z, visibility or None if nobody was detected
+        self.landmarks = landmarks
+
+
+class PoseStage(threading.Thread):
+    """Runs pose inference once per captured frame and publishes LandmarkRecords."""
+
+    def __init__(self, frames, history=RECORD_HISTORY, pose_options=None, scheduler=None,
+                 input_width=POSE_INPUT_WIDTH):
+        super().__init__(name="pose-inference", daemon=True)
+        self.frames = frames
+        self.input_width = input_width
+        self.pose_options = dict(POSE_OPTIONS, **(pose_options or {}))
+        self.scheduler = scheduler or FrameScheduler()
+        self._records = deque(maxlen=history)
+        self._latest_id = -1
+        self._subscribers = 0
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def subscribe(self):
+        """Register a consumer; inference only runs while someone is subscribed."""
+        with self._cond:
+            self._subscribers += 1
+            self._cond.notify_all()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait_for_record(self, after_id=-1, timeout=None):
+        """Block until landmarks for a frame newer than after_id are published."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latest_id > after_id, timeout):
+                return None
+            return self._records[-1]
+
+    def _publish(self, record):
+        with self._cond:
+            self._records.append(record)
+            self._latest_id = record.frame_id
+            self._cond.notify_all()
+
+    def run(self):
+        pose = mp_pose.Pose(**self.pose_options)
+        last_frame_id = -1
+        frame_age = metrics.frame_age('pose')
+
+        try:
+            while not self._stop_event.is_set():
+                # Sleep until at least one consumer needs landmarks
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: self._subscribers > 0 or self._stop_event.is_set()
+                    )
+                if self._stop_event.is_set():
+                    break
+
+                # Hold the target analysis rate, then take the newest frame
+                self.scheduler.wait_until_due()
+                latest = self.frames.wait_for_frame(last_frame_id, timeout=1.0)
+                if latest is None:
+                    continue
+                last_frame_id, timestamp, frame = latest
+                if not self.scheduler.admit(last_frame_id, timestamp):
+                    continue
+
+                image = inference_input(frame, self.input_width)
+                image.flags.writeable = False
+                with STAGE_TIMINGS['process'].time():
+                    result = pose.process(image)
+
+                landmarks = None
+                if result.pose_landmarks:
+                    landmarks = landmarks_to_array(result.pose_landmarks)
+                    landmarks.flags.writeable = False
+                self._publish(LandmarkRecord(last_frame_id, timestamp, landmarks))
+                frame_age.observe(time.time() - timestamp)
+                self.scheduler.finish()
+        except Exception as e:
+            logger.error(f"Error in pose inference thread: {e}")
+        finally:
+            pose.close()
+            logger.info("Pose inference thread stopped")
+
+    def stats(self):
+        stats = {
+            'running': self.is_alive(),
+            'frame_id': self._latest_id,
+            'subscribers': self._subscribers,
+            'input_width': self.input_width
+        }
+        stats.update(self.scheduler.stats())
+        return stats
+
+
+# The single pose stage shared by the stream overlay and every counter
+_stage = None
+_stage_lock = threading.Lock()
+
+
+def get_pose_stage():
+    """Get the shared pose stage, starting capture and inference if necessary."""
+    global _stage
+
+    frames = get_frame_buffer()
+    with _stage_lock:
+        if _stage is not None and _stage.is_alive() and _stage.frames is frames:
+            return _stage
+        if _stage is not None:
+            _stage.stop()
+
+        _stage = PoseStage(frames)
+        _stage.start()
+        return _stage
+
+
+def stop_pose_stage():
+    """Stop the pose inference thread."""
+    global _stage
+
+    with _stage_lock:
+        if _stage is not None:
+            _stage.stop()
+            _stage.join(timeout=2)
+            _stage = None
+
+
+def pose_stage_stats():
+    """Report the state of the pose inference thread."""
+    stage = _stage
+    if stage is None:
+        return {'running': False, 'frame_id': -1, 'subscribers': 0}
+    return stage.stats()
+
+
+def frame_outcomes():
+    """Frames analysed, skipped for a newer one, or dropped as stale."""
+    stats = pose_stage_stats()
+    return [({'outcome': outcome}, stats.get(outcome, 0)) for outcome in ('processed', 'skipped', 'stale')]
+
+
+metrics.collect('pose_analysis_fps', 'Frames per second analysed by the pose stage',
+                lambda: pose_stage_stats().get('achieved_fps', 0.0))
+metrics.collect('pose_analysis_subscribers', 'Consumers currently waiting for landmarks',
+                lambda: pose_stage_stats()['subscribers'])
+metrics.collect('pose_analysis_frames_total', 'Frames seen by the pose stage, by outcome',
+                frame_outcomes, kind='counter')
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+# Target pose analysis rate; the camera delivers about 30 fps
+DEFAULT_TARGET_FPS = float(os.getenv('ANALYSIS_FPS', 30))
+
+
+class FrameScheduler:
+    """Paces frame analysis to a target rate and drops frames when it falls behind.
+
+    The analysis loop always works on the newest captured frame, so frames that
+    arrive while inference is busy are skipped rather than queued. When
+    inference takes longer than the target interval the schedule stretches to
+    the measured inference time, which degrades the rate instead of the latency.
+    """
+
+    def __init__(self, target_fps=DEFAULT_TARGET_FPS, max_frame_age=None):
+        self.target_fps = target_fps
+        self.interval = 1.0 / target_fps if target_fps > 0 else 0.0
+        # Frames older than this when picked up are stale and not analysed
+        self.max_frame_age = max_frame_age if max_frame_age is not None else max(0.2, 3 * self.interval)
+        self.achieved_fps = 0.0
+        self.processed = 0
+        self.skipped = 0   # Frames never looked at because a newer one was available
+        self.stale = 0     # Frames picked up too late to be worth analysing
+        self._busy = 0.0   # Moving average of time spent analysing one frame
+        self._next_due = 0.0
+        self._last_frame_id = None
+        self._started = None
+        self._last_finished = None
+        self._lock = threading.Lock()
+
+    def wait_until_due(self):
+        """Sleep until the next analysis slot."""
+        delay = self._next_due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def admit(self, frame_id, timestamp):
+        """Decide whether to analyse a frame; call finish() after analysing it."""
+        with self._lock:
+            if self._last_frame_id is not None and frame_id > self._last_frame_id + 1:
+                self.skipped += frame_id - self._last_frame_id - 1
+            self._last_frame_id = frame_id
+
+            if time.time() - timestamp > self.max_frame_age:
+                self.stale += 1
+                return False
+
+        self._started = time.monotonic()
+        return True
+
+    def finish(self):
+        """Record how long analysis took and schedule the next slot."""
+        now = time.monotonic()
+        busy = now - self._started
+        with self._lock:
+            self.processed += 1
+            self._busy = busy if self.processed == 1 else 0.9 * self._busy + 0.1 * busy
+
+            # Never schedule faster than inference can keep up with
+            self._next_due = self._started + max(self.interval, self._busy)
+
+            if self._last_finished is not None and now > self._last_finished:
+                instant_fps = 1.0 / (now - self._last_finished)
+                self.achieved_fps = instant_fps if self.achieved_fps == 0 else 0.9 * self.achieved_fps + 0.1 * instant_fps
+            self._last_finished = now
+
+    def stats(self):
+        with self._lock:
+            return {
+                'target_fps': self.target_fps,
+                'achieved_fps': round(self.achieved_fps, 1),
+                'processed': self.processed,
+                'skipped': self.skipped,
+                'stale': self.stale,
+                'inference_ms': round(self._busy * 1000, 1)
+            }
@@ -0,0 +1,110 @@
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from landmark_cache import CachedLandmarkSource, open_cached_source
+from pose_stage import POSE_OPTIONS
+from sources import VideoFileSource
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Exercises whose counters accept a recorded landmark source
+SCORABLE_EXERCISES = ['jumpingjacks', 'pushups', 'squats', 'plank', 'yoga', 'yoga_pose']
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+
+def find_clips(paths):
+    """Expand files and directories into a sorted list of video clips."""
+    clips = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                clips.extend(
+                    os.path.join(root, name) for name in files
+                    if name.lower().endswith(VIDEO_EXTENSIONS)
+                )
+        else:
+            clips.append(path)
+    return sorted(clips)
+
+
+def score_clip(module, exercise, path, make_source=VideoFileSource):
+    """Run one counter over a clip and return its count and form events."""
+    started = time.time()
+    try:
+        source = make_source(path)
+    except Exception as e:
+        return {'clip': path, 'exercise': exercise, 'error': str(e)}
+
+    # Record every change the counter reports, stamped with the clip time
+    events = []
+
+    def record_event(count, feedback, form_status):
+        events.append({
+            'time': round(source.clock(), 3),
+            'count': count,
+            'feedback': feedback,
+            'form_status': form_status
+        })
+
+    # Score the whole clip: the live time limit and rep cap would cut long clips short
+    result = module.count_exercise(update_callback=record_event, source=source, timeout=None, max_count=None)
+    return {
+        'clip': path,
+        'exercise': exercise,
+        'count': result['count'],
+        'feedback': result['feedback'],
+        'cached': isinstance(source, CachedLandmarkSource),
+        'frames': source.frames_read,
+        'duration': round(source.clock(), 3),
+        'elapsed': round(time.time() - started, 3),
+        'events': events
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score recorded workout clips with the rep counters.")
+    parser.add_argument('exercise', choices=SCORABLE_EXERCISES)
+    parser.add_argument('paths', nargs='+', help="Video files or directories of clips")
+    parser.add_argument('--output', help="Write JSON lines here instead of stdout")
+    parser.add_argument('--cache-dir', help="Replay landmarks cached by extract_landmarks.py when available")
+    parser.add_argument('--model-complexity', type=int, choices=[0, 1, 2],
+                        default=POSE_OPTIONS['model_complexity'])
+    args = parser.parse_args(argv)
+    pose_options = dict(POSE_OPTIONS, model_complexity=args.model_complexity)
+
+    def make_source(path):
+        # Cached landmarks skip inference entirely
+        if args.cache_dir:
+            cached = open_cached_source(args.cache_dir, path, pose_options)
+            if cached is not None:
+                return cached
+        return VideoFileSource(path, pose_options=pose_options)
+
+    module = importlib.import_module(f'exercises.{args.exercise}')
+    clips = find_clips(args.paths)
+    if not clips:
+        logger.error("No video clips found")
+        return 1
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for path in clips:
+            result = score_clip(module, args.exercise, path, make_source)
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            logger.info(f"{path}: {result.get('count', result.get('error'))}")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
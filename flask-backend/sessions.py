@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ExerciseSession:
+    """Live state of one exercise set, updated by the counting loop."""
+
+    def __init__(self, exercise):
+        self.id = uuid.uuid4().hex
+        self.exercise = exercise
+        self.state = "pending"  # Can be "pending", "running", "finished" or "failed"
+        self.count = 0
+        self.feedback = "Starting exercise..."
+        self.form_status = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0  # Bumped on every change so push clients can wait for it
+        self._lock = threading.Condition()
+
+    def _changed(self):
+        self.updated_at = time.time()
+        self.version += 1
+        self._lock.notify_all()
+
+    def update(self, count, feedback, form_status=None):
+        """Progress callback handed to count_exercise()."""
+        with self._lock:
+            if (count, feedback, form_status) == (self.count, self.feedback, self.form_status):
+                return
+            self.count = count
+            self.feedback = feedback
+            self.form_status = form_status
+            self._changed()
+
+    def set_state(self, state, result=None, error=None):
+        with self._lock:
+            self.state = state
+            if result is not None:
+                self.result = result
+                self.count = result.get('count', self.count)
+                self.feedback = result.get('feedback', self.feedback)
+            if error is not None:
+                self.error = error
+                self.feedback = error
+            self._changed()
+
+    def is_done(self):
+        return self.state in ("finished", "failed")
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the session moves past version; return a small event or None."""
+        with self._lock:
+            if not self._lock.wait_for(lambda: self.version > version, timeout):
+                return None
+            return {
+                'version': self.version,
+                'state': self.state,
+                'count': self.count,
+                'feedback': self.feedback,
+                'form_status': self.form_status
+            }
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'session_id': self.id,
+                'exercise': self.exercise,
+                'state': self.state,
+                'count': self.count,
+                'feedback': self.feedback,
+                'form_status': self.form_status,
+                'result': self.result,
+                'error': self.error,
+                'version': self.version,
+                'updated_at': self.updated_at
+            }
+
+
+class SessionManager:
+    """Runs counting loops on a bounded worker pool and keeps per-session state."""
+
+    def __init__(self, max_workers=4, session_ttl=600):
+        self.session_ttl = session_ttl  # Seconds to keep finished sessions around
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exercise")
+        self._sessions = {}
+        self._latest_id = None
+        self._lock = threading.Lock()
+
+    def start(self, exercise, run):
+        """Create a session and schedule run(update_callback) on the pool."""
+        session = ExerciseSession(exercise)
+        with self._lock:
+            self._evict_expired()
+            self._sessions[session.id] = session
+            self._latest_id = session.id
+        self._executor.submit(self._run, session, run)
+        return session
+
+    def _run(self, session, run):
+        session.set_state("running")
+        try:
+            result = run(session.update)
+            session.set_state("finished", result=result)
+        except Exception as e:
+            logger.error(f"Error running exercise {session.exercise}: {str(e)}")
+            session.set_state("failed", error=str(e))
+
+    def _evict_expired(self):
+        now = time.time()
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if session.is_done() and now - session.updated_at > self.session_ttl
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def latest(self):
+        """Return the most recently started session, if it is still known."""
+        with self._lock:
+            if self._latest_id is None:
+                return None
+            return self._sessions.get(self._latest_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
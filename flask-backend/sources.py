@@ -0,0 +1,126 @@
+import cv2
+import logging
+import time
+import mediapipe as mp
+from geometry import landmarks_to_array
+from metrics import metrics
+from pose_stage import LandmarkRecord, POSE_OPTIONS, get_pose_stage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+mp_pose = mp.solutions.pose
+
+
+class LiveSource:
+    """Landmark source backed by the shared camera pose stage.
+
+    clock() is wall-clock time, so the counters behave exactly as they do
+    when reading the camera directly. The analysis rate is set by the pose
+    stage's FrameScheduler; every record it publishes is delivered here.
+    """
+
+    finished = False  # A live stream never runs out
+
+    # Time a counting loop spends on one record, and how old the record was by then
+    count_seconds = metrics.stage('counter', 'count')
+    frame_age = metrics.frame_age('counter')
+
+    def __init__(self, pose_stage):
+        self.pose_stage = pose_stage
+        self._last_frame_id = -1
+        self._handed_out = None  # (perf_counter, record) of the record being counted
+        self.pose_stage.subscribe()
+
+    def clock(self):
+        return time.time()
+
+    def next_record(self, timeout=1.0):
+        """Return landmarks for the next analysed frame or None on timeout."""
+        self._finish_record()
+        record = self.pose_stage.wait_for_record(self._last_frame_id, timeout=timeout)
+        if record is not None:
+            self._last_frame_id = record.frame_id
+            self._handed_out = (time.perf_counter(), record)
+        return record
+
+    def _finish_record(self):
+        # The caller is back for more, so it is done with the previous record
+        if self._handed_out is not None:
+            started, record = self._handed_out
+            self.count_seconds.observe(time.perf_counter() - started)
+            self.frame_age.observe(time.time() - record.timestamp)
+            self._handed_out = None
+
+    def close(self):
+        self._finish_record()
+        self.pose_stage.unsubscribe()
+
+
+class VideoFileSource:
+    """Landmark source that runs pose inference over a recorded clip.
+
+    Frames are processed as fast as the CPU allows and clock() follows the
+    clip's own timestamps, so hold times and rep spacing match the recording.
+    """
+
+    # Latency of each step of offline inference
+    timings = {stage: metrics.stage('file', stage) for stage in ('grab', 'flip', 'cvtcolor', 'process')}
+
+    def __init__(self, path, pose_options=None, pose=None):
+        self.path = path
+        self.finished = False
+        self.frames_read = 0
+        self._clock = 0.0
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise Exception(f"Could not open video file {path}")
+        self._fps = self._capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+        # A caller-provided model is reused across clips and left open on close()
+        self._owns_pose = pose is None
+        self._pose = pose or mp_pose.Pose(**dict(POSE_OPTIONS, **(pose_options or {})))
+
+    def clock(self):
+        """Timestamp of the most recent frame, in seconds from the start of the clip."""
+        return self._clock
+
+    def next_record(self, timeout=None):
+        """Return landmarks for the next frame or None once the clip is exhausted."""
+        with self.timings['grab'].time():
+            success, frame = self._capture.read()
+        if not success or frame is None:
+            self.finished = True
+            return None
+
+        # Prefer the container timestamp and fall back to the nominal frame rate
+        position = self._capture.get(cv2.CAP_PROP_POS_MSEC)
+        timestamp = position / 1000.0 if position > 0 else self.frames_read / self._fps
+        self._clock = timestamp
+        frame_id = self.frames_read
+        self.frames_read += 1
+
+        # Same selfie-view orientation as the live pose stage
+        with self.timings['flip'].time():
+            frame = cv2.flip(frame, 1)
+        with self.timings['cvtcolor'].time():
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        image.flags.writeable = False
+        with self.timings['process'].time():
+            result = self._pose.process(image)
+
+        landmarks = None
+        if result.pose_landmarks:
+            landmarks = landmarks_to_array(result.pose_landmarks)
+            landmarks.flags.writeable = False
+        return LandmarkRecord(frame_id, timestamp, landmarks)
+
+    def close(self):
+        self._capture.release()
+        if self._owns_pose:
+            self._pose.close()
+
+
+def open_live_source():
+    """Subscribe to the shared camera pose stage."""
+    return LiveSource(get_pose_stage())
@@ -0,0 +1,250 @@
+import cv2
+import logging
+import queue
+import threading
+import time
+from capture import get_frame_buffer
+from metrics import metrics
+from pose_stage import get_pose_stage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Frames buffered per client before the oldest is dropped for a slow reader
+CLIENT_QUEUE_SIZE = 2
+
+# Display profiles selectable with /video_feed?quality=
+STREAM_PROFILES = {
+    'high': {'width': 1280, 'height': 720, 'quality': 80, 'fps': 30},
+    'medium': {'width': 854, 'height': 480, 'quality': 70, 'fps': 20},
+    'low': {'width': 640, 'height': 360, 'quality': 60, 'fps': 12}
+}
+DEFAULT_PROFILE = 'high'
+
+
+class StreamClient:
+    """Bounded per-viewer queue of encoded JPEG frames."""
+
+    # Frames discarded for every client, for the /metrics endpoint
+    dropped_total = metrics.counter('pose_stream_dropped_frames_total', 'Frames dropped for slow viewers')
+
+    def __init__(self, max_queue=CLIENT_QUEUE_SIZE):
+        self.dropped = 0
+        self.closed = False
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def push(self, frame_bytes):
+        """Queue a frame, discarding the oldest one if the reader is behind."""
+        while True:
+            try:
+                self._queue.put_nowait(frame_bytes)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                    self.dropped_total.inc()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Next encoded frame, or None on timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def depth(self):
+        """Frames waiting to be sent."""
+        return self._queue.qsize()
+
+    def close(self):
+        self.closed = True
+
+
+class StreamEncoder(threading.Thread):
+    """Renders and JPEG-encodes each analysed frame once for every connected client."""
+
+    def __init__(self, key, render, frames, pose_stage, profile=DEFAULT_PROFILE):
+        super().__init__(name=f"stream-encoder-{profile}", daemon=True)
+        self.key = key
+        self.render = render  # render(frame, record) draws the overlay in place
+        self.frames = frames
+        self.pose_stage = pose_stage
+        self.profile = STREAM_PROFILES[profile]
+        self.fps = 0.0
+        self.max_consecutive_errors = 5
+        component = f'stream_{profile}'
+        self.timings = {stage: metrics.stage(component, stage)
+                        for stage in ('resize', 'flip', 'draw', 'imencode')}
+        self.frame_age = metrics.frame_age(component)
+        self.evicted = metrics.counter('pose_stream_evicted_frames_total',
+                                       'Landmark records skipped because their frame had left the ring buffer',
+                                       profile=profile)
+        self._clients = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def add_client(self, client):
+        with self._lock:
+            self._clients.append(client)
+
+    def remove_client(self, client):
+        """Detach a client and return how many are still connected."""
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+            return len(self._clients)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def stats(self):
+        with self._lock:
+            depths = [client.depth() for client in self._clients]
+        return {
+            'viewers': len(depths),
+            'queue_depth': max(depths, default=0),
+            'fps': round(self.fps, 1)
+        }
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        consecutive_errors = 0
+        last_frame_id = -1
+        last_sent = 0.0
+        max_width, max_height = self.profile['width'], self.profile['height']
+        interval = 1.0 / self.profile['fps']
+        encode_params = [cv2.IMWRITE_JPEG_QUALITY, self.profile['quality']]
+
+        self.pose_stage.subscribe()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    # Wait for the pose stage to publish landmarks for a newer frame
+                    record = self.pose_stage.wait_for_record(last_frame_id, timeout=1.0)
+                    if record is None:
+                        logger.warning("No new frame from pose stage")
+                        consecutive_errors += 1
+                        if consecutive_errors >= self.max_consecutive_errors:
+                            logger.error("Too many consecutive frame read errors, stopping stream")
+                            break
+                        continue
+                    last_frame_id = record.frame_id
+
+                    # Hold the profile's frame rate by skipping records that come too soon
+                    now = time.monotonic()
+                    if now - last_sent < interval:
+                        consecutive_errors = 0
+                        continue
+
+                    # Fetch the frame the landmarks were computed on; if it has already
+                    # been overwritten, skip the record rather than draw it on another frame
+                    consecutive_errors = 0
+                    latest = self.frames.read(record.frame_id)
+                    if latest is None:
+                        self.evicted.inc()
+                        continue
+                    _, _, frame = latest
+
+                    # Scale down to fit the profile, keeping the camera's aspect ratio,
+                    # before drawing so the overlay stays legible at every size
+                    height, width = frame.shape[:2]
+                    scale = min(max_width / width, max_height / height)
+                    if scale < 1:
+                        with self.timings['resize'].time():
+                            frame = cv2.resize(frame, (round(width * scale), round(height * scale)),
+                                               interpolation=cv2.INTER_AREA)
+
+                    # Flip the frame horizontally for a selfie-view display
+                    with self.timings['flip'].time():
+                        frame = cv2.flip(frame, 1)
+                    with self.timings['draw'].time():
+                        self.render(frame, record)
+
+                    with self.timings['imencode'].time():
+                        ret, buffer = cv2.imencode('.jpg', frame, encode_params)
+                    if not ret:
+                        logger.warning("Failed to encode frame")
+                        continue
+                    chunk = (b'--frame\r\n'
+                             b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+
+                    # Moving average of the rate frames actually go out at
+                    if last_sent and now > last_sent:
+                        instant_fps = 1.0 / (now - last_sent)
+                        self.fps = instant_fps if self.fps == 0 else 0.9 * self.fps + 0.1 * instant_fps
+                    last_sent = now
+                    with self._lock:
+                        clients = list(self._clients)
+                    for client in clients:
+                        client.push(chunk)
+                    self.frame_age.observe(time.time() - record.timestamp)
+                except Exception as e:
+                    logger.error(f"Error in stream encoder: {str(e)}")
+                    consecutive_errors += 1
+                    if consecutive_errors >= self.max_consecutive_errors:
+                        logger.error("Too many consecutive errors, stopping stream")
+                        break
+                    time.sleep(1)  # Wait before retrying
+        finally:
+            self.pose_stage.unsubscribe()
+            with self._lock:
+                for client in self._clients:
+                    client.close()
+
+
+class StreamHub:
+    """Shares one StreamEncoder per stream key between any number of viewers."""
+
+    def __init__(self):
+        self._encoders = {}
+        self._lock = threading.Lock()
+
+    def connect(self, session_id, render, profile=DEFAULT_PROFILE):
+        """Attach a new client to the encoder for (session_id, profile), starting it if needed."""
+        frames = get_frame_buffer()
+        pose_stage = get_pose_stage()
+        client = StreamClient()
+        key = (session_id, profile)
+        with self._lock:
+            encoder = self._encoders.get(key)
+            if encoder is None or not encoder.is_alive() or encoder.frames is not frames:
+                encoder = StreamEncoder(key, render, frames, pose_stage, profile=profile)
+                self._encoders[key] = encoder
+                encoder.start()
+            encoder.add_client(client)
+        return encoder, client
+
+    def disconnect(self, encoder, client):
+        """Detach a client and stop its encoder once nobody is watching."""
+        with self._lock:
+            if encoder.remove_client(client) == 0:
+                encoder.stop()
+                if self._encoders.get(encoder.key) is encoder:
+                    del self._encoders[encoder.key]
+
+    def stop_all(self):
+        with self._lock:
+            for encoder in self._encoders.values():
+                encoder.stop()
+            self._encoders.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                f"{session_id or 'latest'}/{profile}": encoder.client_count()
+                for (session_id, profile), encoder in self._encoders.items()
+            }
+
+    def encoder_stats(self):
+        """Viewers, deepest client queue and output fps of every running encoder."""
+        with self._lock:
+            encoders = list(self._encoders.items())
+        return {
+            f"{session_id or 'latest'}/{profile}": encoder.stats()
+            for (session_id, profile), encoder in encoders
+        }